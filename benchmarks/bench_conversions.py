@@ -0,0 +1,74 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from spanning_trees_search.GraphMatrix import GraphMatrix
+
+
+def legacy_adjacency2incidence(A):
+    """Original double loop implementation of GraphMatrix.adjacency2incidence(), kept for comparison"""
+    edges = []
+    for i in range(A.shape[0]):
+        for j in range(A.shape[1]):
+            if A[i, j] == 1 and ((i, j) not in edges) and ((j, i) not in edges):
+                edges.append((i, j))
+    I = np.zeros((A.shape[0], len(edges)))
+    for i in range(I.shape[1]):
+        I[:, i] = [1 if k in edges[i] else 0 for k in range(I.shape[0])]
+    return I
+
+
+def legacy_degree_matrix(A):
+    """Original row by row implementation of GraphMatrix.degree_matrix(), kept for comparison"""
+    D = np.zeros(shape=(np.shape(A)[0], np.shape(A)[0]), dtype=np.int32)
+    for i in range(A.shape[0]):
+        D[i, i] = np.sum(A[i])
+    return D
+
+
+def random_adjacency(num_nodes, num_edges, seed=42):
+    """Random simple graph with given number of nodes and edges as dense adjacency matrix"""
+    rng = np.random.default_rng(seed)
+    rows, cols = np.triu_indices(num_nodes, k=1)
+    chosen = rng.choice(len(rows), size=num_edges, replace=False)
+    A = np.zeros((num_nodes, num_nodes), dtype=np.int32)
+    A[rows[chosen], cols[chosen]] = 1
+    A[cols[chosen], rows[chosen]] = 1
+    return A
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark of GraphMatrix conversions (adjacency2incidence, incidence2adjacency, degree_matrix)")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000, 100000], help="Numbers of edges")
+    parser.add_argument("--legacy-max-edges", type=int, default=1000, help="Largest size for which original loop implementations are timed")
+    args = parser.parse_args()
+
+    graph_matrix = GraphMatrix()
+    print("%8s %8s | %12s %12s %12s | %12s %12s" % ("edges", "nodes", "adj2inc", "inc2adj", "degree", "legacy a2i", "legacy deg"))
+    for num_edges in args.sizes:
+        # density around 1/2, so that the dense matrices stay reasonably small
+        num_nodes = int(np.ceil(np.sqrt(4 * num_edges))) + 1
+        A = random_adjacency(num_nodes, num_edges)
+        I, t_a2i = timed(graph_matrix.adjacency2incidence, A)
+        A2, t_i2a = timed(graph_matrix.incidence2adjacency, I)
+        _, t_deg = timed(graph_matrix.degree_matrix, A)
+        assert (A2 == A).all()
+        legacy_a2i = legacy_deg = float("nan")
+        if num_edges <= args.legacy_max_edges:
+            _, legacy_a2i = timed(legacy_adjacency2incidence, A)
+            _, legacy_deg = timed(legacy_degree_matrix, A)
+        print("%8d %8d | %12.5f %12.5f %12.5f | %12.5f %12.5f" % (num_edges, num_nodes, t_a2i, t_i2a, t_deg, legacy_a2i, legacy_deg))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# dependencies which the count path is not supposed to import
+HEAVY_MODULES = ("matplotlib", "pandas", "sympy", "imageio", "tqdm", "networkx", "PIL")
+
+
+def write_k_n(filename, n):
+    """Writing adjacency csv of complete graph K_n in the format of GraphMatrix.save_csv()"""
+    A = np.ones((n, n), dtype=np.int32) - np.eye(n, dtype=np.int32)
+    with open(filename, "w") as f:
+        f.write("," + ",".join(str(i) for i in range(n)) + "\n")
+        for i in range(n):
+            f.write(str(i) + "," + ",".join(str(x) for x in A[i]) + "\n")
+
+
+def imported_modules(command):
+    """Top level packages imported by command, from python -X importtime"""
+    result = subprocess.run([sys.executable, "-X", "importtime"] + command, capture_output=True, text=True, cwd=ROOT)
+    modules = set()
+    for line in result.stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            modules.add(line.rsplit("|", 1)[1].strip().split(".")[0])
+    return modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Startup time of count-only CLI runs (cli.py --count) against a time budget")
+    parser.add_argument("--runs", type=int, default=10, help="Number of measured runs")
+    parser.add_argument("--nodes", type=int, default=10, help="Number of nodes of the counted complete graph")
+    parser.add_argument("--budget", type=float, default=1.0, help="Budget of median wall time in seconds")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, "graph.csv")
+        write_k_n(filename, args.nodes)
+        command = [os.path.join(ROOT, "cli.py"), "--graph-adjacency", filename, "--count"]
+
+        times = []
+        for _ in range(args.runs):
+            start = time.perf_counter()
+            subprocess.run([sys.executable] + command, check=True, capture_output=True, cwd=ROOT)
+            times.append(time.perf_counter() - start)
+        baseline = []
+        for _ in range(args.runs):
+            start = time.perf_counter()
+            subprocess.run([sys.executable, "-c", "pass"], check=True)
+            baseline.append(time.perf_counter() - start)
+        heavy = sorted(imported_modules(command) & set(HEAVY_MODULES))
+
+    median = statistics.median(times)
+    print("cli.py --count on K%d: median %.3f s, min %.3f s (bare interpreter %.3f s)" % (args.nodes, median, min(times), statistics.median(baseline)))
+    print("Heavy modules imported:", ", ".join(heavy) if heavy else "none")
+    if median > args.budget or heavy:
+        print("Startup budget of %.3f s exceeded or heavy modules imported." % args.budget)
+        sys.exit(1)
+    print("Within startup budget of %.3f s." % args.budget)
+
+
+if __name__ == "__main__":
+    main()
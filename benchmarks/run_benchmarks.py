@@ -0,0 +1,192 @@
+import argparse
+import itertools
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import warnings
+
+import matplotlib
+matplotlib.use("Agg")
+import networkx as nx
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from spanning_trees_search.GraphMatrix import GraphMatrix
+from spanning_trees_search.SpanningTrees import SpanningTrees
+
+warnings.filterwarnings("ignore")
+
+
+def graph_families(quick=False):
+    """Generated graphs of benchmark as (family, name, networkx graph)"""
+    families = [
+        ("complete", "K5", nx.complete_graph(5)),
+        ("complete", "K8", nx.complete_graph(8)),
+        ("grid", "grid_4x4", nx.grid_2d_graph(4, 4)),
+        ("grid", "grid_10x10", nx.grid_2d_graph(10, 10)),
+        ("petersen", "petersen", nx.petersen_graph()),
+        ("gnp", "gnp_30_0.2", nx.gnp_random_graph(30, 0.2, seed=42)),
+        ("wheel", "wheel_12", nx.wheel_graph(12)),
+    ]
+    if not quick:
+        families += [
+            ("complete", "K40", nx.complete_graph(40)),
+            ("grid", "grid_30x30", nx.grid_2d_graph(30, 30)),
+            ("gnp", "gnp_200_0.05", nx.gnp_random_graph(200, 0.05, seed=42)),
+            ("wheel", "wheel_200", nx.wheel_graph(200)),
+        ]
+    return [(family, name, nx.convert_node_labels_to_integers(G)) for family, name, G in families]
+
+
+def best_time(function, repeat):
+    """Best wall time of repeated calls and result of the last one"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def bench_conversions(G, repeat):
+    A = nx.to_numpy_array(G, dtype=np.int32)
+    graph_matrix = GraphMatrix()
+    I = graph_matrix.adjacency2incidence(A)
+    return {
+        "adjacency2incidence": best_time(lambda: graph_matrix.adjacency2incidence(A), repeat)[0],
+        "incidence2adjacency": best_time(lambda: graph_matrix.incidence2adjacency(I), repeat)[0],
+        "degree_matrix": best_time(lambda: graph_matrix.degree_matrix(A), repeat)[0],
+    }
+
+
+def bench_count(G, repeat):
+    results = {}
+    for method in ("auto", "bareiss", "modular"):
+        if method == "bareiss" and G.number_of_nodes() > 300:
+            continue
+        def count():
+            graph_matrix = GraphMatrix()
+            graph_matrix.adjacency_matrix = nx.to_numpy_array(G, dtype=np.int32)
+            L = graph_matrix.laplacian_matrix(graph_matrix.adjacency_matrix, graph_matrix.degree_matrix(graph_matrix.adjacency_matrix))
+            if method == "auto":
+                return graph_matrix.reduced_laplacian_determinant(L)
+            return graph_matrix.reduced_laplacian_determinant(L, method=method)
+        seconds, number = best_time(count, repeat)
+        results["count_" + method] = seconds
+    results["spanning_trees_digits"] = len(str(number))
+    return results
+
+
+def bench_enumeration(G, max_trees, time_limit):
+    """Enumeration throughput over the first max_trees trees (or time_limit seconds)"""
+    spanning_trees = SpanningTrees(G)
+    found = 0
+    start = time.perf_counter()
+    for _ in itertools.islice(spanning_trees.iter_spanning_trees(), max_trees):
+        found += 1
+        if found % 256 == 0 and time.perf_counter() - start > time_limit:
+            break
+    seconds = time.perf_counter() - start
+    # time per tree is comparable between runs even when the time limit cuts the enumeration at different points
+    return {"enumeration_trees": found, "enumeration_per_tree": seconds / max(found, 1), "trees_per_second": found / seconds if seconds > 0 else float("inf")}
+
+
+def bench_export(G, num_trees, workers):
+    """Export of the first num_trees trees as csv/png (with gif) and as binary file"""
+    results = {}
+    directory = tempfile.mkdtemp()
+    try:
+        spanning_trees = SpanningTrees(G)
+        spanning_trees.spanning_trees = [spanning_trees.tree_graph(t) for t in itertools.islice(spanning_trees.iter_spanning_trees(), num_trees)]
+        start = time.perf_counter()
+        spanning_trees.export_spanning_trees(save_path=os.path.join(directory, "csv"), workers=workers)
+        results["export_csv_png"] = time.perf_counter() - start
+        start = time.perf_counter()
+        spanning_trees.export_gif()
+        results["export_gif"] = time.perf_counter() - start
+        start = time.perf_counter()
+        spanning_trees.export_spanning_trees(save_path=os.path.join(directory, "binary"), export="edge_ids")
+        results["export_binary"] = time.perf_counter() - start
+        results["export_trees"] = len(spanning_trees.spanning_trees)
+    finally:
+        shutil.rmtree(directory)
+    return results
+
+
+def metadata():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        commit = None
+    return {
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "numpy": np.__version__,
+        "networkx": nx.__version__,
+    }
+
+
+def compare(old_filename, results, threshold):
+    """Printing benchmarks which got slower by more than threshold ratio against older results, returns number of regressions"""
+    with open(old_filename) as f:
+        old = {(r["graph"], r["benchmark"]): r["seconds"] for r in json.load(f)["results"]}
+    regressions = 0
+    for r in results:
+        key = (r["graph"], r["benchmark"])
+        if key not in old or old[key] <= 0:
+            continue
+        ratio = r["seconds"] / old[key]
+        flag = ""
+        if ratio > threshold:
+            regressions += 1
+            flag = "  <-- REGRESSION"
+        print("%-16s %-24s %10.5f -> %10.5f  x%.2f%s" % (key[0], key[1], old[key], r["seconds"], ratio, flag))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks of conversions, counting, enumeration and export over graph families")
+    parser.add_argument("--output", type=str, default="benchmark_results.json", help="JSON file with results")
+    parser.add_argument("--quick", action="store_true", help="Only small graphs")
+    parser.add_argument("--repeat", type=int, default=3, help="Repetitions of timed calls, best time is reported")
+    parser.add_argument("--max-trees", type=int, default=20000, help="Maximal number of enumerated trees per graph")
+    parser.add_argument("--time-limit", type=float, default=5.0, help="Time limit of enumeration per graph in seconds")
+    parser.add_argument("--export-trees", type=int, default=20, help="Number of trees exported per graph")
+    parser.add_argument("--workers", type=int, default=1, help="Number of export processes")
+    parser.add_argument("--compare", type=str, default=None, help="Older JSON results to compare with")
+    parser.add_argument("--threshold", type=float, default=1.25, help="Slowdown ratio reported as regression")
+    args = parser.parse_args()
+
+    results = []
+    for family, name, G in graph_families(args.quick):
+        print("Benchmarking %s (%d nodes, %d edges)" % (name, G.number_of_nodes(), G.number_of_edges()))
+        measured = {}
+        measured.update(bench_conversions(G, args.repeat))
+        measured.update(bench_count(G, args.repeat))
+        measured.update(bench_enumeration(G, args.max_trees, args.time_limit))
+        if G.number_of_nodes() <= 100:
+            measured.update(bench_export(G, args.export_trees, args.workers))
+        extras = {key: measured.pop(key) for key in ("spanning_trees_digits", "enumeration_trees", "trees_per_second", "export_trees") if key in measured}
+        for benchmark, seconds in measured.items():
+            results.append(dict(family=family, graph=name, nodes=G.number_of_nodes(), edges=G.number_of_edges(),
+                                benchmark=benchmark, seconds=seconds, **extras))
+
+    with open(args.output, "w") as f:
+        json.dump({"meta": metadata(), "results": results}, f, indent=2)
+    print("Results saved in ", args.output)
+
+    if args.compare:
+        if compare(args.compare, results, args.threshold) > 0:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
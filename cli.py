@@ -4,36 +4,72 @@ from argparse import RawTextHelpFormatter
 # import GraphMatrix and SpanningTrees and make a CLI interface with option to load and run a spanning tree prediction
 
 # Load the libraries
+# SpanningTrees (with NetworkX and plotting) is imported only when spanning trees are searched, --count needs just NumPy and SciPy
 import argparse
-import networkx as nx
-import matplotlib.pyplot as plt
-import numpy as np
 import os
 import sys
 from spanning_trees_search.GraphMatrix import GraphMatrix
-from spanning_trees_search.SpanningTrees import SpanningTrees
+from spanning_trees_search.GraphCache import GraphCache
+from spanning_trees_search.Profiler import Profiler
 import warnings
 
 warnings.filterwarnings("ignore")
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+def edge_argument(value):
+    """Edge given as 'u,v' by indices of its nodes"""
+    try:
+        u, v = (int(node) for node in value.split(","))
+    except ValueError:
+        raise argparse.ArgumentTypeError("Edge %s is not in the form 'u,v'." % value)
+    return u, v
+
 # Make a parser
 parser = argparse.ArgumentParser(description="""Spanning Trees Search 
     A library for spanning tree computation 
-    - one of the arguments --graph-adjacency --graph-incidence is required 
+    - one of the arguments --graph-adjacency --graph-incidence --graph-edges --batch is required 
     - argument --graph-incidence: not allowed with argument --graph-adjacency 
+    - argument --batch: processes many graphs, outputs of every graph go into its own directory under --output
     
     Example usage:""", formatter_class=RawTextHelpFormatter)
 group = parser.add_mutually_exclusive_group(required=True)
 group.add_argument(
     "--graph-adjacency",
     type=str,
-    help="Graph to be loaded in adjacency matrix format in .csv",
+    help="Graph to be loaded in adjacency matrix format in .csv, .npy or .npz (scipy.sparse)",
 )
 group.add_argument(
     "--graph-incidence",
     type=str,
-    help="Graph to be loaded in incidence matrix format in .csv",
+    help="Graph to be loaded in incidence matrix format in .csv, .npy or .npz (scipy.sparse)",
+)
+group.add_argument(
+    "--graph-edges",
+    type=str,
+    help="Graph to be loaded as edge list: text or .csv with one 'u v' or 'u,v' per line, or .npy/.npz array of edges",
+)
+group.add_argument(
+    "--batch",
+    type=str,
+    help="Glob pattern or directory of graph files (.csv, .npy, .npz; also .txt, .edges, .el, .tsv with --batch-mode edges),\n"
+         "or manifest file with one 'path[,mode]' per line",
+)
+parser.add_argument(
+    "--batch-mode",
+    type=str,
+    help="Input format of graphs in --batch (unless set in manifest)",
+    default="adjacency",
+    choices=["adjacency", "incidence", "edges"],
+)
+parser.add_argument(
+    "--sparse",
+    action="store_true",
+    help="Keep graph matrices sparse (no dense n x n matrix is built from edge lists and sparse files)",
+)
+parser.add_argument(
+    "--mmap",
+    action="store_true",
+    help="Memory-map .npy input instead of reading it into memory",
 )
 parser.add_argument(
     "--output",
@@ -41,13 +77,18 @@ parser.add_argument(
     help="Directory where all files will be saved",
     default="/tests/mygraph_run",
 )
-# parser.add_argument(
-#     "--export",
-#     type=str,
-#     help="Directory where all files will be saved",
-#     default="adjacency_csv",
-#     choices=["adjacency_csv", "incidence_csv", "none"],
-# )
+parser.add_argument(
+    "--export",
+    type=str,
+    help="Export format of spanning trees: csv and png per tree, or one binary file with edge IDs or bitmasks",
+    default="adjacency_csv",
+    choices=["adjacency_csv", "edge_ids", "bitmask"],
+)
+parser.add_argument(
+    "--save-graph",
+    action="store_true",
+    help="Save image and file of the original graph also for binary exports and --sample/--k-best trees",
+)
 # parser.add_argument(
 #     "--visualise",
 #     action="store_true",
@@ -60,6 +101,21 @@ parser.add_argument(
     help="Gif export",
 )
 
+parser.add_argument(
+    "--frame-step",
+    type=int,
+    help="Use every N-th spanning tree as a frame of the gif",
+    default=1,
+    metavar="N",
+)
+
+parser.add_argument(
+    "--max-frames",
+    type=int,
+    help="Maximal number of frames of the gif",
+    default=None,
+)
+
 parser.add_argument(
     "--count", 
     action="store_true",
@@ -72,37 +128,204 @@ parser.add_argument(
     action="store_true",
     )
 
+parser.add_argument(
+    "--sample",
+    type=int,
+    help="Find K uniformly random spanning trees instead of all of them (for graphs with too many trees)",
+    default=None,
+    metavar="K",
+)
+
+parser.add_argument(
+    "--weighted",
+    action="store_true",
+    help="Adjacency matrix holds edge weights (every nonzero entry is an edge), or edge list has weights in the third column",
+)
+
+parser.add_argument(
+    "--k-best",
+    type=int,
+    help="Find K spanning trees with the lowest total weight in ranked order",
+    default=None,
+    metavar="K",
+)
+
+parser.add_argument(
+    "--maximum",
+    action="store_true",
+    help="Rank spanning trees from the highest total weight in --k-best",
+)
+
+parser.add_argument(
+    "--required-edges",
+    type=edge_argument,
+    nargs="+",
+    help="Count and find only spanning trees containing all these edges (given by node indices)",
+    default=None,
+    metavar="U,V",
+)
+
+parser.add_argument(
+    "--forbidden-edges",
+    type=edge_argument,
+    nargs="+",
+    help="Count and find only spanning trees containing none of these edges",
+    default=None,
+    metavar="U,V",
+)
+
+parser.add_argument(
+    "--edge-frequencies",
+    type=str,
+    nargs="?",
+    const="auto",
+    help="Save fraction of spanning trees containing each edge into edge_frequencies.csv, without enumerating trees\n"
+         "(exact for small graphs, approximate for large ones unless METHOD is given)",
+    default=None,
+    choices=["auto", "exact", "approximate"],
+    metavar="METHOD",
+)
+
+parser.add_argument(
+    "--workers",
+    type=int,
+    help="Number of processes exporting spanning trees (processes handling graphs with --batch)",
+    default=1,
+)
+
+parser.add_argument(
+    "--search-workers",
+    type=int,
+    help="Number of processes enumerating disjoint parts of the search tree",
+    default=1,
+)
+
+parser.add_argument(
+    "--cache-dir",
+    type=str,
+    help="Directory of persistent cache of matrices and spanning tree counts (no caching if not set)",
+    default=None,
+)
+
+parser.add_argument(
+    "--cache-trees",
+    action="store_true",
+    help="Store enumerated spanning trees in the cache as well",
+)
+
+parser.add_argument(
+    "--profile",
+    action="store_true",
+    help="Save counters and timers of load, count, search and export into profile.json in --output",
+)
+
+parser.add_argument(
+    "--algorithm",
+    type=str,
+    help="Spanning trees search algorithm",
+    default="contraction_deletion",
+    choices=["contraction_deletion", "random"],
+)
+
 if len(sys.argv)==1:
     parser.print_help(sys.stderr)
     sys.exit(1)
     
 args = parser.parse_args()
+constrained = bool(args.required_edges or args.forbidden_edges)
+if constrained and (args.batch or args.sample or args.k_best or args.algorithm == "random"):
+    parser.error("--required-edges and --forbidden-edges are not supported with --batch, --sample, --k-best and --algorithm random")
 
 
 def main():
+    # Process many graphs if --batch arg is specified
+    if args.batch:
+        from spanning_trees_search.BatchRunner import BatchRunner
+        runner = BatchRunner(args.output, workers=args.workers, mode=args.batch_mode, weighted=args.weighted,
+                             trees=args.trees, sample=args.sample, export=args.export, gif=args.gif,
+                             frame_step=args.frame_step, max_frames=args.max_frames, cache_dir=args.cache_dir,
+                             sparse=args.sparse, mmap=args.mmap)
+        runner.run(args.batch)
+        print("Summary is saved in ", os.path.join(args.output, "summary.csv"))
+        return
+
     # Load the graph
-    graph = GraphMatrix() # Create an instance of GraphMatrix
+    cache = GraphCache(args.cache_dir, store_trees=args.cache_trees) if args.cache_dir else None
+    profiler = Profiler(enabled=args.profile)
+    graph = GraphMatrix(sparse=args.sparse, cache=cache, profiler=profiler) # Create an instance of GraphMatrix
+    # Exact count is needed only by --count and by enumeration of all trees, sampling and ranking skip it (slow for large graphs)
+    count = args.count or (args.trees and not args.sample and not args.k_best)
     if args.graph_adjacency:
-        graph.load(args.graph_adjacency, mode="adjacency") # Load the graph from adjacency matrix
+        graph.load(args.graph_adjacency, mode="adjacency", weighted=args.weighted, mmap=args.mmap, count=count) # Load the graph from adjacency matrix
     if args.graph_incidence:
-        graph.load(args.graph_incidence, mode="incidence") # Load the graph from incidence matrix
+        graph.load(args.graph_incidence, mode="incidence", mmap=args.mmap, count=count) # Load the graph from incidence matrix
+    if args.graph_edges:
+        graph.load(args.graph_edges, mode="edges", weighted=args.weighted, mmap=args.mmap, count=count) # Load the graph from edge list
     
-    # Count if --count arg is specified
+    # Count if --count arg is specified (it is computed while loading)
     if args.count:
-        spanning_trees = SpanningTrees(graph.graph)
-        spanning_trees.spanning_trees_count()
-        print("Number of spanning trees: ", spanning_trees.spanning_trees_num)
+        print("Number of spanning trees: ", graph.adjugate_subdeterminant)
+        if constrained:
+            print("Number of spanning trees with required and forbidden edges: ",
+                  graph.constrained_count(args.required_edges or (), args.forbidden_edges or ()))
 
-    # Find spanning trees if --trees arg is specified
-    if args.trees:
-        spanning_trees = SpanningTrees(graph.graph)
+    # Find spanning trees if --trees, --sample or --k-best arg is specified
+    if args.trees or args.sample or args.k_best:
+        from spanning_trees_search.SpanningTrees import SpanningTrees
+        spanning_trees = SpanningTrees(graph.graph, sparse=args.sparse, cache=cache, profile=profiler)
+        if graph.adjugate_subdeterminant is not None:
+            spanning_trees.spanning_trees_num = graph.adjugate_subdeterminant
         if args.output:
-            spanning_trees.compute_spanning_trees(visualisation=False, progress_bar=False)
-            spanning_trees.export_spanning_trees(export='adjacency_csv', save_path=args.output)
-            if args.gif:
-                spanning_trees.export_gif()
+            trees = None
+            if args.k_best:
+                ranked = spanning_trees.k_best_spanning_trees(args.k_best, maximum=args.maximum)
+                for rank, (weight, edge_ids) in enumerate(ranked, 1):
+                    print(rank, weight, [spanning_trees.edges[i] for i in edge_ids])
+                trees = [edge_ids for _, edge_ids in ranked]
+            elif args.sample:
+                # Uniform sample instead of all trees
+                trees = spanning_trees.sample_spanning_trees(args.sample)
+            elif args.algorithm == "random":
+                spanning_trees.compute_spanning_trees(visualisation=False, progress_bar=False, algorithm=args.algorithm)
+            else:
+                # Trees are streamed straight into the export, none of them is kept in memory
+                if constrained:
+                    print("Number of spanning trees is: ", spanning_trees.spanning_trees_count(
+                        required_edges=args.required_edges, forbidden_edges=args.forbidden_edges))
+                else:
+                    print("Number of spanning trees is: ", spanning_trees.spanning_trees_num)
+                if args.search_workers > 1 or constrained:
+                    trees = spanning_trees.iter_spanning_trees(workers=args.search_workers, required_edges=args.required_edges,
+                                                               forbidden_edges=args.forbidden_edges)
+            spanning_trees.export_spanning_trees(save_path=args.output, workers=args.workers, export=args.export, trees=trees,
+                                                 save_graph=args.save_graph or None)
+            if args.gif and constrained:
+                # export_gif() would enumerate all trees again, constrained ones are enumerated instead
+                trees = spanning_trees.iter_spanning_trees(required_edges=args.required_edges, forbidden_edges=args.forbidden_edges)
+                spanning_trees.export_animation(os.path.join(args.output, "spanning_tree.gif"), trees=trees,
+                                                step=args.frame_step, max_frames=args.max_frames)
+            elif args.gif:
+                spanning_trees.export_gif(step=args.frame_step, max_frames=args.max_frames)
             print("Everyting is saved in ", args.output)
 
+    # Per edge frequencies if --edge-frequencies arg is specified
+    # (after the export of trees, which refuses an existing output directory)
+    if args.edge_frequencies:
+        import numpy as np
+        edges = graph.edge_list()
+        frequencies = graph.edge_tree_frequencies(edges, method=args.edge_frequencies)
+        os.makedirs(args.output, exist_ok=True)
+        filename = os.path.join(args.output, "edge_frequencies.csv")
+        np.savetxt(filename, np.column_stack([edges, frequencies]), delimiter=",", header="u,v,frequency",
+                   comments="", fmt=["%d", "%d", "%.10g"])
+        print("Edge frequencies are saved in ", filename)
+
+    # Save profile if --profile arg is specified
+    if args.profile:
+        os.makedirs(args.output, exist_ok=True)
+        profiler.save(os.path.join(args.output, "profile.json"))
+        print("Profile is saved in ", os.path.join(args.output, "profile.json"))
+
 if __name__ == "__main__":
     main()
     
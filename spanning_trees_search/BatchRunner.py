@@ -0,0 +1,227 @@
+import contextlib
+import csv
+import glob
+import io
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from spanning_trees_search.GraphMatrix import GraphMatrix
+from spanning_trees_search.GraphCache import GraphCache
+
+
+# extensions of matrix files, a single file with any other extension is a manifest
+GRAPH_EXTENSIONS = (".csv", ".npy", ".npz")
+# extensions of graph files listed from a directory, by input mode
+MODE_EXTENSIONS = {
+    "adjacency": GRAPH_EXTENSIONS,
+    "incidence": GRAPH_EXTENSIONS,
+    "edges": (".txt", ".edges", ".el", ".tsv") + GRAPH_EXTENSIONS,
+}
+SUMMARY_COLUMNS = ["name", "path", "mode", "status", "nodes", "edges", "count", "load_seconds", "trees_seconds", "trees_exported", "error"]
+
+
+def _process_graph(task):
+    """Counting (and optionally exporting) spanning trees of one graph, returns row of the summary table.
+    The row is written into result.json of the graph's output directory as the last step, it marks the graph as done."""
+    options = task["options"]
+    output = task["output"]
+    row = {"name": task["name"], "path": task["path"], "mode": task["mode"], "status": "ok", "error": ""}
+    try:
+        os.makedirs(output, exist_ok=True)
+        cache = GraphCache(options["cache_dir"]) if options["cache_dir"] else None
+        start = time.perf_counter()
+        graph = GraphMatrix(sparse=options["sparse"], cache=cache)
+        # progress messages of single graphs would drown the batch progress, the last one explains a failed load
+        messages = io.StringIO()
+        with contextlib.redirect_stdout(messages):
+            graph.load(task["path"], mode=task["mode"], weighted=options["weighted"], mmap=options["mmap"])
+        if graph.adjugate_subdeterminant is None:
+            lines = messages.getvalue().strip().splitlines()
+            raise ValueError(lines[-1] if lines else "Input is not valid or cannot be computed.")
+        shape = graph.adjacency_matrix.shape
+        # malformed files are often parsed into an empty or 1 x 1 matrix, which would be reported as a valid graph
+        if shape[0] != shape[1] or shape[0] < 2:
+            raise ValueError("Input in %s is not a graph with at least 2 nodes (adjacency matrix %d x %d)."
+                             % (task["path"], shape[0], shape[1]))
+        row["load_seconds"] = time.perf_counter() - start
+        row["nodes"] = graph.adjacency_matrix.shape[0]
+        row["edges"] = int(graph.edge_list().shape[0])
+        row["count"] = int(graph.adjugate_subdeterminant)
+
+        if options["trees"] or options["sample"]:
+            from spanning_trees_search.SpanningTrees import SpanningTrees
+            start = time.perf_counter()
+            spanning_trees = SpanningTrees(graph.graph, sparse=options["sparse"], cache=cache)
+            spanning_trees.spanning_trees_num = row["count"]
+            trees = spanning_trees.sample_spanning_trees(options["sample"]) if options["sample"] else None
+            spanning_trees.export_spanning_trees(save_path=os.path.join(output, "trees"), export=options["export"],
+                                                 trees=trees, exist_ok=True)
+            if options["gif"]:
+                spanning_trees.export_gif(step=options["frame_step"], max_frames=options["max_frames"])
+            row["trees_seconds"] = time.perf_counter() - start
+            row["trees_exported"] = len(trees) if trees is not None else row["count"]
+    except Exception as e:
+        row["status"] = "error"
+        row["error"] = "%s: %s" % (type(e).__name__, e)
+
+    tmp_filename = os.path.join(output, "result.json.tmp")
+    with open(tmp_filename, "w") as f:
+        json.dump(row, f)
+    os.replace(tmp_filename, os.path.join(output, "result.json"))
+    return row
+
+
+class BatchRunner:
+    """Processing many graphs in one process (or a pool of processes), so that interpreter startup and imports are paid once.
+
+    Parameters
+    ----------
+    output_root : str
+        Directory with one output directory per graph and summary.csv
+    workers : int, optional
+        Number of processes handling graphs, by default 1 (no process pool)
+    mode : str, optional
+        Input mode of graph files, 'adjacency', 'incidence' or 'edges' (manifest may set it per graph), by default 'adjacency'
+    weighted : bool, optional
+        Adjacency matrices hold edge weights, by default False
+    trees : bool, optional
+        Exporting all spanning trees of every graph, by default False (only counting)
+    sample : int, optional
+        Exporting this many uniformly random spanning trees instead of all of them, by default None
+    export : str, optional
+        Export type of spanning trees (see SpanningTrees.export_spanning_trees()), by default 'adjacency_csv'
+    gif : bool, optional
+        Exporting gif of spanning trees, by default False
+    frame_step, max_frames : int, optional
+        Subsampling of gif frames (see SpanningTrees.export_animation())
+    cache_dir : str, optional
+        Directory of GraphCache shared by all graphs, by default None (no caching)
+    sparse : bool, optional
+        Keeping graph matrices sparse (see GraphMatrix), by default False
+    mmap : bool, optional
+        Memory-mapping .npy inputs (see GraphMatrix.load()), by default False
+
+    Output
+    ------
+    Graphs whose result.json reports status 'ok' for the same path and mode are skipped, so an interrupted batch
+    can be run again to finish it. Files with less than 2 nodes or non-square matrices get status 'error'.
+    ├── output_root
+        │── summary.csv
+        └── <graph name>
+            │── result.json
+            └── trees
+                └── ... (see SpanningTrees.export_spanning_trees())
+    """
+
+    def __init__(self, output_root, workers=1, mode="adjacency", weighted=False, trees=False, sample=None,
+                 export="adjacency_csv", gif=False, frame_step=1, max_frames=None, cache_dir=None, sparse=False, mmap=False):
+        self.output_root = output_root
+        self.workers = workers
+        self.mode = mode
+        self.options = {
+            "weighted": weighted,
+            "trees": trees,
+            "sample": sample,
+            "export": export,
+            "gif": gif,
+            "frame_step": frame_step,
+            "max_frames": max_frames,
+            "cache_dir": cache_dir,
+            "sparse": sparse,
+            "mmap": mmap,
+        }
+
+    def read_graphs(self, source):
+        """List of (path, mode) of graphs given by glob pattern, directory or manifest file.
+        Directory gives all its files with extensions of the mode (see MODE_EXTENSIONS): .csv, .npy and .npz matrices,
+        in 'edges' mode also .txt, .edges, .el and .tsv edge lists.
+        Manifest is a text file with one graph per line: path, optionally followed by comma and mode;
+        relative paths are relative to the manifest, empty lines and lines starting with # are ignored."""
+        if os.path.isdir(source):
+            paths = [path for extension in MODE_EXTENSIONS[self.mode] for path in glob.glob(os.path.join(source, "*" + extension))]
+            return [(path, self.mode) for path in sorted(paths)]
+        if os.path.isfile(source) and not source.endswith(GRAPH_EXTENSIONS):
+            graphs = []
+            directory = os.path.dirname(os.path.abspath(source))
+            with open(source) as f:
+                for line in f:
+                    line = line.strip()
+                    if not line or line.startswith("#"):
+                        continue
+                    path, _, mode = line.partition(",")
+                    graphs.append((os.path.join(directory, path.strip()), mode.strip() or self.mode))
+            return graphs
+        return [(path, self.mode) for path in sorted(glob.glob(source, recursive=True))]
+
+    @staticmethod
+    def graph_names(paths):
+        """Unique output directory names of graphs, derived from file names"""
+        names = []
+        used = set()
+        for path in paths:
+            name = os.path.splitext(os.path.basename(path))[0]
+            unique, i = name, 1
+            while unique in used:
+                unique = "%s_%d" % (name, i)
+                i += 1
+            used.add(unique)
+            names.append(unique)
+        return names
+
+    def is_done(self, name, path, mode):
+        """Checking if graph was already processed successfully into output directory name from the same path and mode.
+        Names depend on the order of graphs (see graph_names()), so a directory may hold the result of another file."""
+        filename = os.path.join(self.output_root, name, "result.json")
+        if not os.path.exists(filename):
+            return False
+        with open(filename) as f:
+            result = json.load(f)
+        return (result.get("status") == "ok" and result.get("mode") == mode
+                and os.path.abspath(result.get("path", "")) == os.path.abspath(path))
+
+    def run(self, source):
+        """Processing all graphs of source (see read_graphs()), writing summary.csv, returns list of summary rows"""
+        graphs = self.read_graphs(source)
+        if not graphs:
+            raise ValueError("No graphs found in %s." % source)
+        os.makedirs(self.output_root, exist_ok=True)
+        names = self.graph_names([path for path, _ in graphs])
+        tasks = [
+            {"name": name, "path": path, "mode": mode, "output": os.path.join(self.output_root, name), "options": self.options}
+            for name, (path, mode) in zip(names, graphs)
+            if not self.is_done(name, path, mode)
+        ]
+        print("%d graphs, %d already done, %d to process." % (len(graphs), len(graphs) - len(tasks), len(tasks)))
+
+        done = len(graphs) - len(tasks)
+        if self.workers <= 1:
+            results = map(_process_graph, tasks)
+        else:
+            executor = ProcessPoolExecutor(max_workers=self.workers)
+            results = (future.result() for future in as_completed([executor.submit(_process_graph, task) for task in tasks]))
+        try:
+            for row in results:
+                done += 1
+                if row["status"] == "ok":
+                    print("[%d/%d] %s: %d spanning trees (%.3f s)" % (done, len(graphs), row["name"], row["count"], row["load_seconds"]))
+                else:
+                    print("[%d/%d] %s: %s" % (done, len(graphs), row["name"], row["error"]))
+        finally:
+            if self.workers > 1:
+                executor.shutdown(cancel_futures=True)
+
+        rows = []
+        for name in names:
+            with open(os.path.join(self.output_root, name, "result.json")) as f:
+                rows.append(json.load(f))
+        self.write_summary(rows)
+        return rows
+
+    def write_summary(self, rows):
+        """Writing summary table of counts and timings into summary.csv of output root"""
+        with open(os.path.join(self.output_root, "summary.csv"), "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=SUMMARY_COLUMNS, extrasaction="ignore")
+            writer.writeheader()
+            for row in rows:
+                writer.writerow(row)
@@ -0,0 +1,197 @@
+from spanning_trees_search.TreeEnumerator import TreeEnumerator
+
+
+class BlockDecomposition:
+    """Biconnected blocks of a graph given by integer edge IDs.
+
+    Parameters
+    ----------
+    num_nodes : int
+        Vertices are 0..num_nodes-1
+    edges : list of (int, int)
+        Edge with ID i is edges[i]
+
+    Description
+    -----------
+    Every cycle lies inside one biconnected block, so a set of edges is a spanning tree of a connected graph
+    if and only if it is a union of spanning trees of all its blocks:
+        - bridges (blocks of a single edge) are in every spanning tree
+        - the number of spanning trees is the product of numbers of spanning trees of blocks with two or more edges
+        - spanning trees are the Cartesian product of spanning trees of these blocks
+    Blocks are found by iterative Tarjan's algorithm in O(n + m), parallel edges form a block, loops are ignored.
+    Blocks are ordered by decreasing number of edges.
+    Required (included) and forbidden (excluded) edges are constraints of the blocks they lie in,
+    a forbidden bridge leaves no spanning tree and a required bridge is in every tree anyway.
+    """
+
+    def __init__(self, num_nodes, edges):
+        self.num_nodes = num_nodes
+        self.edges = [(int(u), int(v)) for u, v in edges]
+        blocks, self.num_components = self._biconnected_blocks()
+        self.bridges = sorted(block[0] for block in blocks if len(block) == 1)
+        self.blocks = sorted((sorted(block) for block in blocks if len(block) > 1), key=lambda block: (-len(block), block[0]))
+
+    def _biconnected_blocks(self):
+        """Lists of edge IDs of biconnected blocks and number of connected components"""
+        n = self.num_nodes
+        adjacency = [[] for _ in range(n)]
+        for i, (u, v) in enumerate(self.edges):
+            if u != v:
+                adjacency[u].append((v, i))
+                adjacency[v].append((u, i))
+        discovery = [-1] * n
+        low = [0] * n
+        time = 0
+        blocks = []
+        num_components = 0
+        edge_stack = []
+        for root in range(n):
+            if discovery[root] != -1:
+                continue
+            num_components += 1
+            discovery[root] = low[root] = time
+            time += 1
+            # explicit stack of (vertex, ID of the edge it was entered by, iterator over its neighbours)
+            stack = [(root, -1, iter(adjacency[root]))]
+            while stack:
+                x, parent_edge, neighbours = stack[-1]
+                for y, i in neighbours:
+                    if i == parent_edge:
+                        continue
+                    if discovery[y] == -1:
+                        edge_stack.append(i)
+                        discovery[y] = low[y] = time
+                        time += 1
+                        stack.append((y, i, iter(adjacency[y])))
+                        break
+                    if discovery[y] < discovery[x]:
+                        # back edge to an ancestor (seen from the descendant end only)
+                        edge_stack.append(i)
+                        low[x] = min(low[x], discovery[y])
+                else:
+                    stack.pop()
+                    if stack:
+                        parent = stack[-1][0]
+                        low[parent] = min(low[parent], low[x])
+                        if low[x] >= discovery[parent]:
+                            # parent separates the subtree of x, edges pushed since entering x form one block
+                            block = []
+                            while True:
+                                i = edge_stack.pop()
+                                block.append(i)
+                                if i == parent_edge:
+                                    break
+                            blocks.append(block)
+        return blocks, num_components
+
+    @property
+    def num_parts(self):
+        """Number of blocks including bridges"""
+        return len(self.blocks) + len(self.bridges)
+
+    def is_connected(self):
+        return self.num_components == 1
+
+    def block_graph(self, block):
+        """Block as a graph of its own: (number of nodes, edge list with nodes relabelled to 0..k-1),
+        local edge ID j is global edge ID block[j]"""
+        index = {}
+        edges = []
+        for i in block:
+            u, v = self.edges[i]
+            edges.append((index.setdefault(u, len(index)), index.setdefault(v, len(index))))
+        return len(index), edges
+
+    def block_constraints(self, included=(), excluded=()):
+        """Included and excluded edges of every block as lists of local edge IDs (see block_graph()),
+        list of (included, excluded) per block, None if no tree can satisfy them (excluded bridge or included loop)"""
+        position = {}
+        for j, block in enumerate(self.blocks):
+            for local, i in enumerate(block):
+                position[i] = (j, local)
+        constraints = [([], []) for _ in self.blocks]
+        for k, edge_ids in enumerate((included, excluded)):
+            for i in map(int, edge_ids):
+                if i in position:
+                    j, local = position[i]
+                    constraints[j][k].append(local)
+                else:
+                    # edge outside blocks is a bridge or a loop, no tree avoids a bridge or contains a loop
+                    is_loop = self.edges[i][0] == self.edges[i][1]
+                    if is_loop == (k == 0):
+                        return None
+        return constraints
+
+    def count(self, count_block, included=(), excluded=()):
+        """Number of spanning trees containing included edges and avoiding excluded edges, as product of counts of blocks,
+        count_block(num_nodes, edges, included, excluded) counts one block with its local constraints"""
+        if not self.is_connected():
+            return 0
+        constraints = self.block_constraints(included, excluded)
+        if constraints is None:
+            return 0
+        count = 1
+        for block, (block_included, block_excluded) in zip(self.blocks, constraints):
+            count *= count_block(*self.block_graph(block), block_included, block_excluded)
+            if count == 0:
+                break
+        return count
+
+    def _block_trees(self, j, included=(), excluded=(), profiler=None):
+        block = self.blocks[j]
+        for tree in TreeEnumerator(*self.block_graph(block), included, excluded, profiler=profiler):
+            yield [block[i] for i in tree]
+
+    def iter_trees(self, first_block_trees=None, profiler=None, included=(), excluded=()):
+        """Lazily yielding spanning trees as sorted tuples of edge IDs, in lexicographic order of the product of blocks.
+        Trees of the first (largest) block are enumerated once, the other blocks are enumerated again for every tree
+        of the preceding ones, so memory is bounded by the size of the graph.
+
+        Parameters
+        ----------
+        first_block_trees : iterable, optional
+            Trees of the first block as tuples of local edge IDs (see block_graph()), by default enumerated by TreeEnumerator
+        profiler : Profiler, optional
+            Receiving search counters of block enumerations (see TreeEnumerator), by default None
+        included, excluded : iterable of int, optional
+            IDs of edges contained in (avoided by) every tree, by default none (see block_constraints()),
+            given first_block_trees have to respect them already
+        """
+        if not self.is_connected():
+            return
+        constraints = self.block_constraints(included, excluded)
+        if constraints is None:
+            return
+        if not self.blocks:
+            yield tuple(self.bridges)
+            return
+        first = self.blocks[0]
+        if first_block_trees is None:
+            iterators = [self._block_trees(0, *constraints[0], profiler=profiler)]
+        else:
+            iterators = [([first[i] for i in tree] for tree in first_block_trees)]
+        iterators += [self._block_trees(j, *constraints[j], profiler=profiler) for j in range(1, len(self.blocks))]
+        current = [next(iterator, None) for iterator in iterators]
+        if any(block_tree is None for block_tree in current):
+            # some block has no tree satisfying its constraints
+            return
+        while True:
+            tree = list(self.bridges)
+            for block_tree in current:
+                tree.extend(block_tree)
+            tree.sort()
+            yield tuple(tree)
+            # advancing the last block, exhausted blocks start over and carry to the preceding one
+            j = len(iterators) - 1
+            while j >= 0:
+                current[j] = next(iterators[j], None)
+                if current[j] is not None:
+                    break
+                if j == 0:
+                    return
+                iterators[j] = self._block_trees(j, *constraints[j], profiler=profiler)
+                current[j] = next(iterators[j])
+                j -= 1
+
+    def __iter__(self):
+        return self.iter_trees()
@@ -0,0 +1,149 @@
+import numpy as np
+from spanning_trees_search.GraphMatrix import _mod_float, _primes_below
+
+# default budget of the inverses kept by DynamicLaplacian, in bytes (float64 n x n matrix per prime)
+MAX_MEMORY = 2 ** 29
+
+
+def _inverse_mod(matrix, p, block_size=32):
+    """Determinant and inverse of integer matrix modulo prime p < 2^20 by blocked Gauss-Jordan elimination.
+    Entries are kept in float64, updates of whole rows are done by matrix multiplication (BLAS),
+    which stays exact as long as block_size * p^2 < 2^52 (see _determinant_mod() of GraphMatrix).
+    Returns (determinant mod p, inverse mod p), inverse is None if the matrix is singular modulo p."""
+    n = matrix.shape[0]
+    A = np.hstack([_mod_float(np.array(matrix, dtype=np.float64), p), np.eye(n)])
+    det = 1
+    for k in range(0, n, block_size):
+        end = min(k + block_size, n)
+        # choosing pivot rows by elimination on a copy of the panel A[k:, k:end]
+        panel = A[k:, k:end].copy()
+        for j in range(end - k):
+            nonzero = np.flatnonzero(panel[j:, j])
+            if len(nonzero) == 0:
+                return 0, None
+            pivot_row = j + nonzero[0]
+            if pivot_row != j:
+                panel[[j, pivot_row]] = panel[[pivot_row, j]]
+                A[[k + j, k + pivot_row]] = A[[k + pivot_row, k + j]]
+                det = -det
+            pivot = int(panel[j, j])
+            det = det * pivot % p
+            factors = _mod_float(panel[j + 1:, j] * pow(pivot, p - 2, p), p)
+            panel[j + 1:, j:] = _mod_float(panel[j + 1:, j:] - np.outer(factors, panel[j, j:]), p)
+        # pivot block B = A[k:end, k:end] is invertible now, rows of the block become B^-1 A[k:end]
+        # and the block column is eliminated from all other rows
+        block_inverse = np.eye(end - k)
+        B = A[k:end, k:end].copy()
+        for j in range(end - k):
+            factor = pow(int(B[j, j]), p - 2, p)
+            B[j] = _mod_float(B[j] * factor, p)
+            block_inverse[j] = _mod_float(block_inverse[j] * factor, p)
+            factors = B[:, j].copy()
+            factors[j] = 0
+            B = _mod_float(B - np.outer(factors, B[j]), p)
+            block_inverse = _mod_float(block_inverse - np.outer(factors, block_inverse[j]), p)
+        rows = _mod_float(block_inverse @ A[k:end], p)
+        column = A[:, k:end].copy()
+        column[k:end] = 0
+        A = _mod_float(A - column @ rows, p)
+        A[k:end] = rows
+    return det % p, A[:, n:]
+
+
+class DynamicLaplacian:
+    """Exact number of spanning trees maintained under insertions and deletions of edges.
+
+    Parameters
+    ----------
+    laplacian_matrix : numpy array or scipy.sparse matrix
+        Laplacian matrix of the graph (integer, multigraphs allowed)
+    max_memory : int, optional
+        Budget of the inverses in bytes, by default None (MAX_MEMORY, 512 MB). ValueError is raised when
+        the primes needed for the current graph would exceed it, by the constructor or by count().
+
+    Description
+    -----------
+    Reduced Laplacian M (first row and column removed) changes by a rank-one term when an edge (u, v) is added or removed:
+    M' = M +- b b^T, where b = e_u - e_v (the entry of the removed vertex is left out).
+    By the matrix determinant lemma det(M') = det(M) (1 +- b^T M^-1 b) and by Sherman-Morrison formula
+    M'^-1 = M^-1 -+ (M^-1 b)(M^-1 b)^T / (1 +- b^T M^-1 b).
+    Both are kept exactly modulo several primes below 2^20 (float64 arithmetic stays exact, as in GraphMatrix),
+    enough for their product to exceed twice Hadamard's bound (product of the diagonal of M), and the count is
+    recovered by Chinese remainder theorem. M^-1 b is a difference of two columns, so an update costs O(n^2) per prime.
+    The bound has about n log2(average degree) bits, so k = O(n) primes of 19-20 bits are needed: every change costs
+    O(k n^2) = O(n^3) operations and the inverses take k n^2 float64 entries, e.g. about 80 primes and 640 MB
+    for a 3-regular graph on 1000 vertices (more than MAX_MEMORY).
+    When M becomes singular modulo a prime (e.g. graph got disconnected) the inverse of that prime is recomputed
+    from scratch in O(n^3) on the next count(), as are primes added when the bound grows.
+    """
+
+    def __init__(self, laplacian_matrix, max_memory=None):
+        L = laplacian_matrix.toarray() if hasattr(laplacian_matrix, "toarray") else np.asarray(laplacian_matrix)
+        self.reduced = np.array(L[1:, 1:], dtype=np.int64)
+        self.max_memory = MAX_MEMORY if max_memory is None else max_memory
+        self.primes = []
+        # prime -> [determinant mod p, inverse mod p or None if it has to be recomputed]
+        self.states = {}
+        self._prime_source = _primes_below(2 ** 20)
+        # primes below 2^20 have at least 19 bits
+        self._check_memory(int(self._bound_bits() / 19) + 1)
+
+    def _bound_bits(self):
+        return np.log2(np.maximum(np.diag(self.reduced), 1).astype(np.float64)).sum() + 2
+
+    def _check_memory(self, num_primes):
+        """Raising ValueError if inverses modulo num_primes primes do not fit into max_memory"""
+        n = self.reduced.shape[0]
+        memory = num_primes * n * n * 8
+        if memory > self.max_memory:
+            raise ValueError("Incremental count needs inverses modulo %d primes (%d MB), more than the budget of %d MB."
+                             % (num_primes, memory // 2 ** 20, self.max_memory // 2 ** 20))
+
+    def update(self, u, v, multiplicity=1):
+        """Adding multiplicity copies of edge (u, v) (removing them if multiplicity is negative), u and v are vertices of the full graph"""
+        if u == v:
+            return
+        b = [(i - 1, s) for i, s in ((u, 1), (v, -1)) if i != 0]
+        for i, s in b:
+            for j, t in b:
+                self.reduced[i, j] += multiplicity * s * t
+        for p in self.primes:
+            det, inverse = self.states[p]
+            if inverse is None:
+                continue
+            w = sum(s * inverse[:, i] for i, s in b)
+            denominator = int(1 + multiplicity * sum(s * w[i] for i, s in b)) % p
+            det = det * denominator % p
+            if denominator == 0:
+                self.states[p] = [det, None]
+                continue
+            factor = (-multiplicity * pow(denominator, p - 2, p)) % p
+            w = _mod_float(w, p)
+            self.states[p] = [det, _mod_float(inverse + np.outer(w, _mod_float(w * factor, p)), p)]
+
+    def count(self):
+        """Exact number of spanning trees of the current graph"""
+        if self.reduced.shape[0] == 0:
+            return 1
+        if np.any(np.diag(self.reduced) == 0):
+            return 0
+        bound_bits = self._bound_bits()
+        residue, modulus = 0, 1
+        i = 0
+        while modulus.bit_length() <= bound_bits:
+            if i == len(self.primes):
+                self._check_memory(i + 1)
+                self.primes.append(next(self._prime_source))
+                self.states[self.primes[-1]] = [0, None]
+            p = self.primes[i]
+            if self.states[p][1] is None:
+                self.states[p] = list(_inverse_mod(self.reduced, p))
+            r = self.states[p][0]
+            # combining residue mod modulus with r mod p
+            t = (r - residue) * pow(modulus, -1, p) % p
+            residue += modulus * t
+            modulus *= p
+            i += 1
+        if residue > modulus // 2:
+            residue -= modulus
+        return residue
@@ -0,0 +1,62 @@
+import numpy as np
+from PIL import Image, GifImagePlugin
+
+
+class GifWriter:
+    """Streaming writer of animated gif, every frame is encoded and written as soon as it is appended.
+    Same interface as imageio writers (append_data(), close()), but frames are not collected until close()
+    and they are not quantized one by one: palette is computed once from the first frame and the following frames
+    are mapped on it by a lookup table (good fit for frames sharing colors, such as drawings of one graph).
+
+    Parameters
+    ----------
+    filename : str
+    duration : float, optional
+        Duration of one frame in seconds, by default 0.2
+    loop : int, optional
+        Number of loops, by default 0 (forever)
+    """
+
+    def __init__(self, filename, duration=0.2, loop=0):
+        self.file = open(filename, "wb")
+        self.duration = int(round(duration * 1000))
+        self.loop = loop
+        self.palette = None
+        self.lookup = None
+
+    def _set_palette(self, frame):
+        """Adaptive palette of the first frame and lookup table of nearest palette colors for 5-bit RGB"""
+        image = Image.fromarray(frame).quantize(colors=256, method=Image.Quantize.MEDIANCUT)
+        self.palette = np.array(image.getpalette()[:768], dtype=np.float64).reshape(-1, 3)
+        grid = (np.indices((32, 32, 32)).reshape(3, -1).T * 8 + 4).astype(np.float64)
+        distances = (grid ** 2).sum(axis=1)[:, None] - 2 * grid @ self.palette.T + (self.palette ** 2).sum(axis=1)[None, :]
+        # flat table indexed by r << 10 | g << 5 | b of 5-bit channels
+        self.lookup = distances.argmin(axis=1).astype(np.uint8)
+        self.palette_bytes = self.palette.astype(np.uint8).tobytes()
+
+    def _paletted(self, frame):
+        rgb = (np.asarray(frame)[:, :, :3] >> 3).astype(np.uint16)
+        image = Image.fromarray(self.lookup[(rgb[:, :, 0] << 10) | (rgb[:, :, 1] << 5) | rgb[:, :, 2]], mode="P")
+        image.putpalette(self.palette_bytes)
+        return image
+
+    def append_data(self, frame):
+        """Appending frame given as (height, width, 3 or 4) uint8 array"""
+        if self.lookup is None:
+            self._set_palette(np.ascontiguousarray(np.asarray(frame)[:, :, :3]))
+            header, _ = GifImagePlugin.getheader(self._paletted(frame), info={"loop": self.loop, "duration": self.duration})
+            for block in header:
+                self.file.write(block)
+        for block in GifImagePlugin.getdata(self._paletted(frame), duration=self.duration):
+            self.file.write(block)
+
+    def close(self):
+        if self.lookup is not None:
+            self.file.write(b";")
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -0,0 +1,131 @@
+import hashlib
+import json
+import os
+from collections import OrderedDict
+import numpy as np
+from scipy import sparse
+
+
+class GraphCache:
+    """Two-tier cache of computed graph matrices, spanning tree counts and enumerated tree files.
+    Entries are keyed by fingerprint of the (labelled) edge set, so that repeated runs on the same topology skip the computation.
+
+    Parameters
+    ----------
+    directory : str, optional
+        Directory of the persistent on-disk tier, by default ~/.cache/spanning_trees_search
+    max_entries : int, optional
+        Maximal number of values kept in the in-memory LRU tier, by default 128
+    store_trees : bool, optional
+        Whether enumerated spanning trees are stored as well (in SpanningTreesFile format), by default False
+
+    Output
+    ------
+    Example of on-disk structure:
+    ├── directory
+        └── <fingerprint>
+            │── count.json
+            │── incidence_matrix.npy
+            │── degree_matrix.sparse.npz
+            │── laplacian_matrix.sparse.npz
+            └── spanning_trees_edge_ids.bin
+    """
+
+    def __init__(self, directory=None, max_entries=128, store_trees=False):
+        if directory is None:
+            directory = os.path.join(os.path.expanduser("~"), ".cache", "spanning_trees_search")
+        self.directory = directory
+        self.max_entries = max_entries
+        self.store_trees = store_trees
+        self.memory = OrderedDict()
+        os.makedirs(self.directory, exist_ok=True)
+
+    @staticmethod
+    def fingerprint(num_nodes, edges):
+        """Canonical hash of graph given by number of nodes and integer edge list (order and orientation of edges does not matter)"""
+        E = np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+        E = np.unique(np.sort(E, axis=1), axis=0)
+        h = hashlib.sha256()
+        h.update(np.int64(num_nodes).tobytes())
+        h.update(E.tobytes())
+        return h.hexdigest()
+
+    def _path(self, key, filename):
+        return os.path.join(self.directory, key, filename)
+
+    def _remember(self, key, name, value):
+        self.memory[(key, name)] = value
+        self.memory.move_to_end((key, name))
+        while len(self.memory) > self.max_entries:
+            self.memory.popitem(last=False)
+
+    def _recall(self, key, name):
+        if (key, name) in self.memory:
+            self.memory.move_to_end((key, name))
+            return self.memory[(key, name)]
+        return None
+
+    def _replace(self, tmp_filename, filename):
+        """Moving finished file into place, so that interrupted writes never leave partial cache entries"""
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        os.replace(tmp_filename, filename)
+
+    def get_matrix(self, key, name):
+        """Cached matrix (numpy array or scipy.sparse matrix) or None"""
+        value = self._recall(key, name)
+        if value is not None:
+            return value
+        if os.path.exists(self._path(key, name + ".npy")):
+            value = np.load(self._path(key, name + ".npy"))
+        elif os.path.exists(self._path(key, name + ".sparse.npz")):
+            value = sparse.load_npz(self._path(key, name + ".sparse.npz")).tocsr()
+        else:
+            return None
+        self._remember(key, name, value)
+        return value
+
+    def put_matrix(self, key, name, value):
+        """Storing matrix (numpy array or scipy.sparse matrix) in both tiers"""
+        self._remember(key, name, value)
+        os.makedirs(os.path.join(self.directory, key), exist_ok=True)
+        if sparse.issparse(value):
+            filename = self._path(key, name + ".sparse.npz")
+            tmp_filename = filename + ".tmp.npz"
+            sparse.save_npz(tmp_filename, sparse.csr_matrix(value))
+        else:
+            filename = self._path(key, name + ".npy")
+            tmp_filename = filename + ".tmp.npy"
+            np.save(tmp_filename, value)
+        self._replace(tmp_filename, filename)
+
+    def get_count(self, key):
+        """Cached number of spanning trees or None"""
+        value = self._recall(key, "count")
+        if value is not None:
+            return value
+        if not os.path.exists(self._path(key, "count.json")):
+            return None
+        with open(self._path(key, "count.json")) as f:
+            value = json.load(f)["count"]
+        self._remember(key, "count", value)
+        return value
+
+    def put_count(self, key, count):
+        """Storing number of spanning trees (exact int) in both tiers"""
+        self._remember(key, "count", count)
+        filename = self._path(key, "count.json")
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        with open(filename + ".tmp", "w") as f:
+            json.dump({"count": int(count)}, f)
+        self._replace(filename + ".tmp", filename)
+
+    def trees_filename(self, key, encoding="edge_ids"):
+        """Path of the cached spanning trees file (it may not exist yet)"""
+        return self._path(key, "spanning_trees_%s.bin" % encoding)
+
+    def has_trees(self, key, encoding="edge_ids"):
+        return os.path.exists(self.trees_filename(key, encoding))
+
+    def commit_trees(self, key, tmp_filename, encoding="edge_ids"):
+        """Moving completely written spanning trees file into the cache"""
+        self._replace(tmp_filename, self.trees_filename(key, encoding))
@@ -1,18 +1,421 @@
+import heapq
+import itertools
 import numpy as np
-from sympy.matrices import Matrix
-import pandas as pd
-import networkx as nx
-import matplotlib.pyplot as plt
+from scipy import sparse
+from spanning_trees_search.Profiler import Profiler
+# networkx, matplotlib, pandas, sympy and scipy.sparse.linalg are imported where they are used,
+# so that counting (e.g. cli.py --count) does not pay for importing them
+
+
+def _read_csv_matrix(filename, dtype):
+    """Reading matrix from .csv file with header row and index column (as written by pandas.DataFrame.to_csv)"""
+    with open(filename) as f:
+        num_columns = f.readline().count(",") + 1
+    matrix = np.loadtxt(filename, delimiter=",", skiprows=1, usecols=range(1, num_columns), dtype=np.float64, ndmin=2)
+    return matrix.astype(dtype)
+
+
+def _write_csv_matrix(filename, matrix, block_rows=4096):
+    """Writing matrix (numpy array or scipy.sparse matrix) into .csv file with header row and index column,
+    sparse matrices are densified one block of rows at a time"""
+    is_sparse = sparse.issparse(matrix)
+    if is_sparse:
+        matrix = sparse.csr_matrix(matrix)
+    integer = (matrix.dtype.kind in "iub")
+    with open(filename, "w") as f:
+        f.write("," + ",".join(str(j) for j in range(matrix.shape[1])) + "\n")
+        for start in range(0, matrix.shape[0], block_rows):
+            block = matrix[start:start + block_rows]
+            block = block.toarray() if is_sparse else np.asarray(block)
+            index = np.arange(start, start + block.shape[0]).reshape(-1, 1)
+            np.savetxt(f, np.hstack([index, block]), delimiter=",", fmt="%d" if integer else ["%d"] + ["%.17g"] * block.shape[1])
+
+
+def _read_matrix(filename, dtype, mmap=False):
+    """Reading matrix from .csv (see _read_csv_matrix()), .npy (numpy array, memory-mapped if mmap)
+    or .npz file (scipy.sparse matrix saved by sparse.save_npz(), or numpy archive with the matrix as its first array)"""
+    if filename.endswith(".npy"):
+        return np.load(filename, mmap_mode="r" if mmap else None)
+    if filename.endswith(".npz"):
+        with np.load(filename) as archive:
+            if "format" in archive.files:
+                return sparse.load_npz(filename)
+            return archive[archive.files[0]]
+    return _read_csv_matrix(filename, dtype)
+
+
+def _dense_to_csr(matrix, dtype, block_rows=4096):
+    """Converting dense (e.g. memory-mapped) matrix to CSR matrix one block of rows at a time,
+    so that only nonzero entries and a single block are held in memory"""
+    blocks = []
+    for start in range(0, matrix.shape[0], block_rows):
+        blocks.append(sparse.csr_matrix(np.asarray(matrix[start:start + block_rows], dtype=dtype)))
+    if not blocks:
+        return sparse.csr_matrix(matrix.shape, dtype=dtype)
+    return sparse.vstack(blocks, format="csr")
+
+
+def _read_edge_list(filename, chunksize=1000000, mmap=False):
+    """Reading edge list from .npy / .npz array of shape (m, 2) or (m, 3) with weights in the third column,
+    or from text file with one edge 'u v' or 'u,v' per line, optionally followed by weight.
+    Text is parsed in chunks of chunksize lines. Lines starting with # and a header line (e.g. 'u,v') are skipped,
+    comment '# nodes N' sets the number of nodes (isolated nodes are kept).
+    Returns (edges as int64 array of shape (m, 2), weights as float64 array or None, number of nodes or None)"""
+    num_nodes = None
+    if filename.endswith(".npy") or filename.endswith(".npz"):
+        if filename.endswith(".npy"):
+            data = np.load(filename, mmap_mode="r" if mmap else None)
+        else:
+            with np.load(filename) as archive:
+                data = archive["edges"] if "edges" in archive.files else archive[archive.files[0]]
+                if "weights" in archive.files:
+                    data = np.column_stack([data, archive["weights"]])
+                if "num_nodes" in archive.files:
+                    num_nodes = int(archive["num_nodes"])
+        data = np.asarray(data).reshape(len(data), -1)
+    else:
+        chunks = []
+        with open(filename) as f:
+            # leading comments, header and delimiter are found from the first lines
+            line = f.readline()
+            while line and (not line.strip() or line.lstrip().startswith("#")):
+                words = line.lstrip("#").split()
+                if len(words) == 2 and words[0] == "nodes":
+                    num_nodes = int(words[1])
+                line = f.readline()
+            delimiter = "," if "," in line else None
+            lines = f
+            if line:
+                try:
+                    float(line.split(delimiter)[0])
+                    lines = itertools.chain([line], f)
+                except ValueError:
+                    pass
+            while True:
+                chunk = list(itertools.islice(lines, chunksize))
+                if not chunk:
+                    break
+                data = np.loadtxt(chunk, delimiter=delimiter, dtype=np.float64, ndmin=2)
+                # chunk of empty or comment lines
+                if data.size:
+                    chunks.append(data)
+        data = np.vstack(chunks) if chunks else np.zeros((0, 2))
+    edges = np.asarray(data[:, :2], dtype=np.int64)
+    weights = np.asarray(data[:, 2], dtype=np.float64) if data.shape[1] > 2 else None
+    return edges, weights, num_nodes
+
+
+def _edges_to_matrix(num_nodes, edges, values):
+    """Symmetric CSR matrix with values of edges (u, v), loops are dropped and values of repeated edges are added up"""
+    u, v = edges[:, 0], edges[:, 1]
+    keep = u != v
+    u, v, values = u[keep], v[keep], np.asarray(values)[keep]
+    return sparse.coo_matrix((np.concatenate([values, values]), (np.concatenate([u, v]), np.concatenate([v, u]))),
+                             shape=(num_nodes, num_nodes)).tocsr()
+
+
+def _is_prime(n):
+    """Deterministic Miller-Rabin primality test for n < 3 317 044 064 679 887 385 961 981"""
+    if n < 2:
+        return False
+    for p in (2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37):
+        if n % p == 0:
+            return n == p
+    d, r = n - 1, 0
+    while d % 2 == 0:
+        d //= 2
+        r += 1
+    for a in (2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37):
+        x = pow(a, d, n)
+        if x == 1 or x == n - 1:
+            continue
+        for _ in range(r - 1):
+            x = x * x % n
+            if x == n - 1:
+                break
+        else:
+            return False
+    return True
+
+
+def _primes_below(limit):
+    """Generating primes in descending order below limit"""
+    candidate = limit - 1 if limit % 2 == 0 else limit - 2
+    while candidate > 2:
+        if _is_prime(candidate):
+            yield candidate
+        candidate -= 2
+
+
+def _bareiss_determinant(matrix):
+    """Exact determinant of integer matrix by fraction-free Bareiss elimination on Python ints"""
+    A = [[int(x) for x in row] for row in matrix]
+    n = len(A)
+    if n == 0:
+        return 1
+    sign = 1
+    prev = 1
+    for k in range(n - 1):
+        if A[k][k] == 0:
+            for i in range(k + 1, n):
+                if A[i][k] != 0:
+                    A[k], A[i] = A[i], A[k]
+                    sign = -sign
+                    break
+            else:
+                return 0
+        akk = A[k][k]
+        row_k = A[k]
+        for i in range(k + 1, n):
+            row_i = A[i]
+            aik = row_i[k]
+            for j in range(k + 1, n):
+                row_i[j] = (akk * row_i[j] - aik * row_k[j]) // prev
+        prev = akk
+    return sign * A[n - 1][n - 1]
+
+
+def _mod_float(x, p):
+    """Reducing float64 array of integers (|x| < 2^52) modulo p, much faster than np.mod on floats"""
+    r = x - np.floor(x / p) * p
+    # correctly rounded division can only overshoot to the next multiple, giving a negative remainder
+    return np.where(r < 0, r + p, r)
+
+
+def _determinant_mod(matrix, p, block_size=32):
+    """Determinant of integer matrix modulo prime p < 2^20 by blocked Gaussian elimination with partial pivoting.
+    Entries are kept in float64, trailing updates are done by matrix multiplication (BLAS),
+    which stays exact as long as block_size * p^2 < 2^52.
+    """
+    A = _mod_float(np.array(matrix, dtype=np.float64), p)
+    n = A.shape[0]
+    det = 1
+    for k in range(0, n, block_size):
+        end = min(k + block_size, n)
+        # factorization of the panel A[k:, k:end]
+        for j in range(k, end):
+            nonzero = np.flatnonzero(A[j:, j])
+            if len(nonzero) == 0:
+                return 0
+            pivot_row = j + nonzero[0]
+            if pivot_row != j:
+                A[[j, pivot_row]] = A[[pivot_row, j]]
+                det = -det
+            pivot = int(A[j, j])
+            det = det * pivot % p
+            factors = _mod_float(A[j + 1:, j] * pow(pivot, p - 2, p), p)
+            A[j + 1:, j] = factors
+            A[j + 1:, j + 1:end] = _mod_float(A[j + 1:, j + 1:end] - np.outer(factors, A[j, j + 1:end]), p)
+        if end == n:
+            break
+        # block row of U, A[k:end, end:] = L11^-1 A[k:end, end:]
+        for j in range(k, end - 1):
+            A[j + 1:end, end:] = _mod_float(A[j + 1:end, end:] - np.outer(A[j + 1:end, j], A[j, end:]), p)
+        # trailing update
+        A[end:, end:] = _mod_float(A[end:, end:] - A[end:, k:end] @ A[k:end, end:], p)
+    return det % p
+
+
+# largest sparse matrix densified for 'modular' determinant (float64, about 500 MB)
+MAX_DENSE_DIMENSION = 8000
+
+
+def _sparse_elimination_work(matrix):
+    """Estimated number of operations of sparse elimination of symmetric matrix (sum of squared column counts
+    of its Cholesky-like factor under minimum degree ordering), None if the matrix is numerically singular.
+    The factor pattern comes from SuperLU, which takes milliseconds even for thousands of vertices."""
+    from scipy.sparse.linalg import splu
+    try:
+        lu = splu(sparse.csc_matrix(matrix, dtype=np.float64), permc_spec="MMD_AT_PLUS_A", diag_pivot_thresh=0,
+                  options={"SymmetricMode": True})
+    except RuntimeError:
+        return None
+    column_counts = np.diff(lu.L.tocsc().indptr).astype(np.float64)
+    return float((column_counts ** 2).sum())
+
+
+def _modular_determinant(matrix, positive_semidefinite=False):
+    """Exact determinant of integer matrix by Chinese remainder theorem over determinants modulo primes.
+    Enough primes are used for their product to exceed twice Hadamard's bound of the determinant
+    (product of the diagonal for positive semidefinite matrices, product of row norms otherwise).
+    """
+    A = np.array(matrix, dtype=np.int64)
+    if A.shape[0] == 0:
+        return 1
+    if positive_semidefinite:
+        bounds = np.diag(A).astype(np.float64)
+    else:
+        bounds = np.sqrt((A.astype(np.float64) ** 2).sum(axis=1))
+    if np.any(bounds == 0):
+        return 0
+    bound_bits = np.log2(bounds).sum() + 2
+    residue, modulus = 0, 1
+    for p in _primes_below(2 ** 20):
+        r = _determinant_mod(A, p)
+        # combining residue mod modulus with r mod p
+        t = (r - residue) * pow(modulus, -1, p) % p
+        residue += modulus * t
+        modulus *= p
+        if modulus.bit_length() > bound_bits:
+            break
+    if residue > modulus // 2:
+        residue -= modulus
+    return residue
+
+
+def _inverse_mod(x, primes):
+    """Inverses of residues x modulo primes (elementwise arrays, x not divisible by primes) by Fermat's little theorem"""
+    result = np.ones_like(x)
+    base = x.copy()
+    exponents = primes - 2
+    while exponents.any():
+        odd = (exponents & 1).astype(bool)
+        result[odd] = result[odd] * base[odd] % primes[odd]
+        base = base * base % primes
+        exponents >>= 1
+    return result
+
+
+def _sparse_determinant_mod(matrix, primes, bound_bits, chunk_elements=2 ** 22):
+    """Determinants of sparse symmetric positive semidefinite matrix modulo each of primes (< 2^20) at once.
+    Every entry of the elimination holds a vector of residues, one per prime, so each elimination step is
+    a few numpy operations over all primes. Vertex of minimum current degree is eliminated first to limit fill-in.
+
+    Returns (residues, valid). A prime is not valid when one of its pivots vanished modulo the prime only.
+    Pivots vanishing modulo primes whose product exceeds 2^bound_bits (bound of every leading minor) mean
+    the minor itself is zero, all residues are then zero and valid.
+    """
+    M = sparse.csr_matrix(matrix)
+    M.sum_duplicates()
+    n = M.shape[0]
+    primes = np.asarray(primes, dtype=np.int64)
+    coo = M.tocoo()
+    # rows[i][j] = slot of entry (i, j) in pool, which holds its residues modulo all primes
+    capacity = max(2 * coo.nnz, 16)
+    pool = np.zeros((capacity, len(primes)), dtype=np.int64)
+    pool[:coo.nnz] = np.mod(coo.data.astype(np.int64)[:, None], primes)
+    rows = [dict() for _ in range(n)]
+    for slot, (i, j) in enumerate(zip(coo.row.tolist(), coo.col.tolist())):
+        rows[i][j] = slot
+    used = coo.nnz
+    free = []
+    det = np.ones(len(primes), dtype=np.int64)
+    valid = np.ones(len(primes), dtype=bool)
+    heap = [(len(row), i) for i, row in enumerate(rows)]
+    heapq.heapify(heap)
+    while heap:
+        degree, k = heapq.heappop(heap)
+        if degree != len(rows[k]):
+            # stale heap entry, degree of k changed since it was pushed
+            continue
+        row_k = rows[k]
+        if k not in row_k:
+            return np.zeros(len(primes), dtype=np.int64), np.ones(len(primes), dtype=bool)
+        slot_kk = row_k.pop(k)
+        pivot = pool[slot_kk].copy()
+        zero = (pivot == 0) & valid
+        if zero.any():
+            if np.log2(primes[zero]).sum() > bound_bits:
+                return np.zeros(len(primes), dtype=np.int64), np.ones(len(primes), dtype=bool)
+            valid &= ~zero
+            if not valid.any():
+                return det, valid
+        pivot[pivot == 0] = 1
+        det = det * pivot % primes
+        neighbours = list(row_k)
+        free.append(slot_kk)
+        if neighbours:
+            slots_k = [row_k[j] for j in neighbours]
+            values = pool[slots_k]
+            factors = values * _inverse_mod(pivot, primes) % primes
+            free.extend(slots_k)
+            d = len(neighbours)
+            slots = np.empty((d, d), dtype=np.intp)
+            fill = []
+            for a, i in enumerate(neighbours):
+                row_i = rows[i]
+                free.append(row_i.pop(k))
+                for b, j in enumerate(neighbours):
+                    slot = row_i.get(j)
+                    if slot is None:
+                        if free:
+                            slot = free.pop()
+                        else:
+                            slot = used
+                            used += 1
+                        row_i[j] = slot
+                        fill.append(slot)
+                    slots[a, b] = slot
+                heapq.heappush(heap, (len(row_i), i))
+            if used > len(pool):
+                grown = np.zeros((max(used, 2 * len(pool)), len(primes)), dtype=np.int64)
+                grown[:len(pool)] = pool
+                pool = grown
+            if fill:
+                pool[fill] = 0
+            # a_ij -= a_ik / a_kk * a_kj for all neighbours i, j of k, in chunks of rows bounding temporary memory
+            step = max(1, chunk_elements // (d * len(primes)))
+            for start in range(0, d, step):
+                block = slots[start:start + step]
+                pool[block] = (pool[block] - factors[start:start + step, None, :] * values[None, :, :]) % primes
+        rows[k] = {}
+    return det, valid
+
+
+def _sparse_determinant(matrix):
+    """Exact determinant of sparse symmetric positive semidefinite matrix (e.g. reduced Laplacian) by
+    Chinese remainder theorem over sparse fraction-free elimination modulo many primes at once
+    (see _sparse_determinant_mod()), no dense matrix is built. Enough primes are used for their product
+    to exceed twice the product of the diagonal, which bounds the determinant.
+    """
+    M = sparse.csr_matrix(matrix)
+    if M.shape[0] == 0:
+        return 1
+    diagonal = M.diagonal().astype(np.float64)
+    if np.any(diagonal <= 0):
+        # positive semidefinite matrix with zero diagonal entry has zero row
+        return 0
+    bound_bits = np.log2(diagonal).sum() + 2
+    residue, modulus = 0, 1
+    primes = _primes_below(2 ** 20)
+    while modulus.bit_length() <= bound_bits:
+        # primes below 2^20 have at least 19 bits, a few more make up for primes lost on vanishing pivots
+        batch = list(itertools.islice(primes, int((bound_bits - modulus.bit_length()) / 19) + 4))
+        residues, valid = _sparse_determinant_mod(M, batch, bound_bits)
+        for p, r, ok in zip(batch, residues.tolist(), valid.tolist()):
+            if ok:
+                t = (r - residue) * pow(modulus, -1, p) % p
+                residue += modulus * t
+                modulus *= p
+    if residue > modulus // 2:
+        residue -= modulus
+    return residue
 
 
 class GraphMatrix:
     """
     A class for storing and computing matrices of graph.
     Setting of adjacency or incidence matrix (as type numpy array) is mandatory. The rest is computed automatically.
+
+    Parameters
+    ----------
+    sparse : bool, optional
+        If True, all matrices are stored as scipy.sparse CSR matrices instead of dense numpy arrays, by default False
+    cache : GraphCache, optional
+        Cache of derived matrices and spanning tree count, by default None (no caching)
+    profiler : Profiler, optional
+        Timing of load, matrices, count and graph phases, by default None (disabled)
     """
 
-    def __init__(self):
+    def __init__(self, sparse=False, cache=None, profiler=None):
 
+        self.sparse = sparse
+        self.cache = cache
+        self.profiler = profiler if profiler is not None else Profiler(enabled=False)
+        self.cache_key = None
+        self.weight_matrix = None
+        self.dynamic = None
+        self.dynamic_refused = False
         self.adjacency_set = False
         self.incidence_set = True
         self.adjugate_subdeterminant = None
@@ -25,33 +428,50 @@ class GraphMatrix:
 
         Parameters
         ----------
-        incidence_matrix : numpy array
+        incidence_matrix : numpy array or scipy.sparse matrix
         """
-        I = np.array(incidence_matrix)
-        adj = (np.dot(I, I.T) > 0).astype(int)
-        np.fill_diagonal(adj, 0)
-        A = adj
-        return A
+        if sparse.issparse(incidence_matrix):
+            I = sparse.csr_matrix(incidence_matrix)
+            A = sparse.csr_matrix(I @ I.T)
+            A.setdiag(0)
+            A.eliminate_zeros()
+            A.data = (A.data > 0).astype(np.int32)
+            return A
+        # sparse product touches only nonzero entries instead of dense I @ I.T
+        return self.incidence2adjacency(sparse.csr_matrix(np.asarray(incidence_matrix))).toarray()
 
     def adjacency2incidence(self, adjacency_matrix):
         """Compute incidence matrix from adjacency matrix
 
         Parameters
         ----------
-        adjacency matrix : numpy array
+        adjacency matrix : numpy array or scipy.sparse matrix
         """
+        if sparse.issparse(adjacency_matrix):
+            # upper triangle in row-major order, same edge order as in the dense case
+            upper = sparse.triu(adjacency_matrix, format="csr")
+            upper.sort_indices()
+            rows = np.repeat(np.arange(upper.shape[0]), np.diff(upper.indptr))
+            hit = upper.data == 1
+            rows, cols = rows[hit], upper.indices[hit]
+            edge_ids = np.arange(len(rows))
+            loop = rows == cols
+            I = sparse.coo_matrix(
+                (np.ones(2 * len(rows) - loop.sum(), dtype=np.int32),
+                 (np.concatenate([rows, cols[~loop]]), np.concatenate([edge_ids, edge_ids[~loop]]))),
+                shape=(upper.shape[0], len(rows)),
+            )
+            return I.tocsr()
         # compute incidence matrix from adjacency matrix
-        A = adjacency_matrix
-        edges = []
-        for i in range(A.shape[0]):
-            for j in range(A.shape[1]):
-                if A[i, j] == 1 and ((i, j) not in edges) and ((j, i) not in edges):
-                    edges.append((i, j))
+        A = np.asarray(adjacency_matrix)
+        connected = A == 1
+        # edges (i, j), i <= j, in row-major order of the upper triangle
+        rows, cols = np.nonzero(np.triu(connected | connected.T))
+        edge_ids = np.arange(len(rows))
         # indexing connections for each edge
-        I = np.zeros((A.shape[0], len(edges)))
-        for i in range(I.shape[1]):
-            I[:, i] = [1 if k in edges[i] else 0 for k in range(I.shape[0])]
-        #I = I.T
+        I = np.zeros((A.shape[0], len(rows)), dtype=np.int32)
+        I[rows, edge_ids] = 1
+        I[cols, edge_ids] = 1
         return I
 
     def degree_matrix(self, adjacency_matrix):
@@ -63,11 +483,9 @@ class GraphMatrix:
         """
         # compute degree matrix from adjacency matrix
         A = adjacency_matrix
-        D = np.zeros(shape=(np.shape(A)[0], np.shape(A)[0]))
-        D = D.astype(np.int32)
-        for i in range(A.shape[0]):
-            D[i, i] = np.sum(A[i])
-        return D
+        if sparse.issparse(A):
+            return sparse.diags(np.asarray(A.sum(axis=1)).ravel().astype(np.int32), format="csr")
+        return np.diag(np.asarray(A).sum(axis=1)).astype(np.int32)
 
     def laplacian_matrix(self, adjacency_matrix, degree_matrix):
         """Compute Laplacian matrix from adjacency matrix and degree matrix
@@ -96,113 +514,619 @@ class GraphMatrix:
         #             L_adj[i, j] = (-1) ** (i + j) * L[j, i]
         # return L_adj
 
-        return np.array(Matrix(laplacian_matrix).adjugate(), dtype=np.int32)
+        from sympy.matrices import Matrix
+        # object dtype keeps exact Python ints, int32 would overflow for large counts
+        return np.array(Matrix(laplacian_matrix).adjugate(), dtype=object)
+
+    def reduced_laplacian_determinant(self, laplacian_matrix, method="auto"):
+        """Compute exact determinant of Laplacian matrix with first row and column removed.
+        By Kirchhoff's theorem it equals the number of spanning trees (and any cofactor of the adjugate).
+
+        Parameters
+        ----------
+        Laplacian matrix : numpy array or scipy.sparse matrix
+        method : str
+            'bareiss': fraction-free Bareiss elimination on Python big ints
+            'modular': Gaussian elimination modulo several primes combined by Chinese remainder theorem
+            'sparse': elimination on sparse rows with minimum degree ordering modulo many primes at once,
+                combined by Chinese remainder theorem, no dense matrix is built
+            'auto': 'bareiss' for small dense input, otherwise 'sparse' when the estimated fill-in of sparse elimination
+                is small (e.g. grids and planar graphs) and 'modular' when it is not; sparse input with more than
+                MAX_DENSE_DIMENSION rows stays 'sparse', as 'modular' builds a dense matrix
+        """
+        if sparse.issparse(laplacian_matrix):
+            L = sparse.csr_matrix(laplacian_matrix)
+        else:
+            L = np.asarray(laplacian_matrix)
+        if L.shape[0] == 0:
+            return 0
+        reduced = L[1:, 1:]
+        if method == "auto":
+            n = reduced.shape[0]
+            is_sparse = sparse.issparse(reduced)
+            if not is_sparse and n <= 100:
+                method = "bareiss"
+            else:
+                low_fill = False
+                nonzeros = reduced.nnz if is_sparse else np.count_nonzero(reduced)
+                # sparse elimination costs roughly 50 times more per operation than dense modular elimination (BLAS)
+                if nonzeros <= 0.1 * n * n:
+                    work = _sparse_elimination_work(reduced)
+                    low_fill = work is not None and 50 * work < n ** 3
+                method = "sparse" if low_fill or (is_sparse and n > MAX_DENSE_DIMENSION) else "modular"
+        if method == "sparse":
+            return _sparse_determinant(reduced)
+        if sparse.issparse(reduced):
+            reduced = reduced.toarray()
+        if method == "bareiss":
+            return _bareiss_determinant(reduced)
+        elif method == "modular":
+            return _modular_determinant(reduced, positive_semidefinite=True)
+        else:
+            raise Exception("Method not supported.")
+
+    def contracted_laplacian_matrix(self, num_nodes, edges, contracted=(), deleted=()):
+        """Compute Laplacian matrix of the quotient multigraph G / contracted - deleted.
+        Nodes joined by contracted edges are merged, parallel edges are kept (as multiplicities), loops are dropped.
+        Returns None if contracted edges contain a cycle or a deleted edge (no spanning tree contains all of them).
+
+        Parameters
+        ----------
+        num_nodes : int
+        edges : list of (int, int)
+            Integer edge list, edge IDs are its indices
+        contracted : iterable of int
+            IDs of contracted edges
+        deleted : iterable of int
+            IDs of deleted edges
+        """
+        from scipy.sparse.csgraph import connected_components
+        E = np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+        contracted = np.unique(np.asarray(list(contracted), dtype=np.int64))
+        deleted = np.asarray(list(deleted), dtype=np.int64)
+        if np.isin(contracted, deleted).any():
+            return None
+        keep = np.ones(len(E), dtype=bool)
+        keep[contracted] = False
+        keep[deleted] = False
+        C = E[contracted]
+        joined = sparse.coo_matrix((np.ones(len(C)), (C[:, 0], C[:, 1])), shape=(num_nodes, num_nodes))
+        k, labels = connected_components(joined, directed=False)
+        if len(C) != num_nodes - k:
+            return None
+        u, v = labels[E[keep, 0]], labels[E[keep, 1]]
+        u, v = u[u != v], v[u != v]
+        A = sparse.coo_matrix((np.ones(2 * len(u), dtype=np.int64), (np.concatenate([u, v]), np.concatenate([v, u]))), shape=(k, k)).tocsr()
+        L = sparse.diags(np.asarray(A.sum(axis=1)).ravel()) - A
+        return sparse.csr_matrix(L) if self.sparse else L.toarray()
+
+    def constrained_spanning_trees_count(self, num_nodes, edges, contracted=(), deleted=(), method="auto"):
+        """Compute exact number of spanning trees containing all contracted edges and none of deleted edges,
+        as Kirchhoff count of the quotient multigraph (see contracted_laplacian_matrix())
+
+        Parameters
+        ----------
+        num_nodes : int
+        edges : list of (int, int)
+        contracted : iterable of int
+        deleted : iterable of int
+        method : str
+            Determinant method (see reduced_laplacian_determinant())
+        """
+        L = self.contracted_laplacian_matrix(num_nodes, edges, contracted, deleted)
+        if L is None:
+            return 0
+        if L.shape[0] == 1:
+            return 1
+        return self.reduced_laplacian_determinant(L, method=method)
+
+    def constrained_count(self, required_edges=(), forbidden_edges=(), method="auto"):
+        """Compute exact number of spanning trees of the loaded graph containing all required edges and none of forbidden edges
+        (see constrained_spanning_trees_count())
+
+        Parameters
+        ----------
+        required_edges : iterable of (int, int)
+            Edges given by their nodes, in any orientation
+        forbidden_edges : iterable of (int, int)
+        method : str
+            Determinant method (see reduced_laplacian_determinant())
+        """
+        edges = self.edge_list()
+        contracted = self.edge_ids(required_edges, edges)
+        deleted = self.edge_ids(forbidden_edges, edges)
+        with self.profiler.timer("count"):
+            return self.constrained_spanning_trees_count(self.adjacency_matrix.shape[0], edges, contracted, deleted, method=method)
+
+    def edge_ids(self, node_pairs, edges=None):
+        """IDs (indices into edge_list()) of edges given by their nodes, raises ValueError for a pair which is not an edge
+
+        Parameters
+        ----------
+        node_pairs : iterable of (int, int)
+        edges : numpy array, optional
+            Edge list, by default edge_list()
+        """
+        if edges is None:
+            edges = self.edge_list()
+        index = {}
+        for i, (u, v) in enumerate(edges.tolist()):
+            index[(u, v)] = index[(v, u)] = i
+        ids = []
+        for u, v in node_pairs:
+            if (int(u), int(v)) not in index:
+                raise ValueError("Edge (%s, %s) is not in the graph." % (u, v))
+            ids.append(index[(int(u), int(v))])
+        return ids
+
+    def laplacian_log_determinant(self, laplacian_matrix):
+        """Compute natural logarithm of the reduced Laplacian determinant (number of spanning trees) in floating point.
+        Fast estimate for very large graphs, returns -inf if there is no spanning tree.
+
+        Parameters
+        ----------
+        Laplacian matrix : numpy array or scipy.sparse matrix
+        """
+        if sparse.issparse(laplacian_matrix):
+            if laplacian_matrix.shape[0] == 0:
+                return -np.inf
+            if laplacian_matrix.shape[0] == 1:
+                return 0.0
+            from scipy.sparse.linalg import splu
+            reduced = sparse.csc_matrix(laplacian_matrix, dtype=np.float64)[1:, 1:]
+            try:
+                lu = splu(reduced)
+            except RuntimeError:
+                # factor is exactly singular
+                return -np.inf
+            diagonal = lu.U.diagonal()
+            if np.any(diagonal == 0):
+                return -np.inf
+            return float(np.log(np.abs(diagonal)).sum())
+        L = np.asarray(laplacian_matrix, dtype=np.float64)
+        if L.shape[0] == 0:
+            return -np.inf
+        sign, logdet = np.linalg.slogdet(L[1:, 1:])
+        if sign <= 0:
+            return -np.inf
+        return float(logdet)
     
+    def edge_tree_frequencies(self, edges=None, method="auto", epsilon=0.3, solver="splu", block_size=64, seed=0):
+        """Fraction of spanning trees containing each edge, without enumerating trees.
+        The fraction equals effective resistance between endpoints of the edge (all edges having unit resistance),
+        R_uv = (e_u - e_v)^T L^+ (e_u - e_v), and the fractions sum up to n - 1.
+
+        Parameters
+        ----------
+        edges : numpy array of shape (m, 2), optional
+            Edges (u, v) given by node indices, by default edge_list()
+        method : str, optional
+            'exact': inverse of the reduced Laplacian (dense inverse, or sparse LU solves in sparse mode), O(n^3) time
+            'approximate': random projection of Spielman and Srivastava, R_uv = ||Z (e_u - e_v)||^2 where Z = Q B L^+
+                for random +-1 matrix Q with k = 24 ln(n) / epsilon^2 rows, each row of Z is one Laplacian solve,
+                results are within factor (1 +- epsilon) with high probability, O(n + m) memory per block of rows
+            'auto': 'exact' for graphs up to 2000 nodes, 'approximate' otherwise
+        epsilon : float, optional
+            Relative error of 'approximate' method, by default 0.3
+        solver : str, optional
+            Laplacian solver of 'approximate' method, 'splu' (sparse LU factorization computed once)
+            or 'cg' (conjugate gradient, no fill-in, for graphs whose factorization does not fit in memory), by default 'splu'
+        block_size : int, optional
+            Number of projections solved together in 'approximate' method, by default 64
+        seed : int, optional
+            Random seed of 'approximate' method, by default 0
+
+        Output
+        ------
+        numpy array of shape (m,) aligned with edges
+        """
+        from scipy.sparse.csgraph import connected_components
+        if not self.adjacency_set:
+            self.compute_remaining_matrices(count=False)
+        # exact count is not needed, Laplacian is built directly if matrices were not computed yet
+        # (degree_matrix and laplacian_matrix methods are shadowed by the computed matrices)
+        A = self.adjacency_matrix
+        if self.matrices_computed:
+            laplacian = self.laplacian_matrix
+        else:
+            laplacian = GraphMatrix.laplacian_matrix(self, A, GraphMatrix.degree_matrix(self, A))
+        edges = self.edge_list() if edges is None else np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+        n = laplacian.shape[0]
+        if n == 0 or connected_components(sparse.csr_matrix(A), directed=False)[0] != 1:
+            raise ValueError("No spanning trees found. Graph is not connected.")
+        if n == 1 or len(edges) == 0:
+            return np.zeros(len(edges))
+        if method == "auto":
+            method = "exact" if n <= 2000 else "approximate"
+        u, v = edges[:, 0], edges[:, 1]
+        # node 0 is grounded, its potential is 0 and its row and column are removed from the Laplacian
+        reduced = laplacian[1:, 1:]
+
+        if method == "exact":
+            if sparse.issparse(reduced):
+                from scipy.sparse.linalg import splu
+                lu = splu(sparse.csc_matrix(reduced, dtype=np.float64))
+                X = np.zeros((n, n))
+                for start in range(0, n - 1, block_size):
+                    end = min(start + block_size, n - 1)
+                    X[1:, 1 + start:1 + end] = lu.solve(np.eye(n - 1, end - start, -start))
+            else:
+                X = np.zeros((n, n))
+                X[1:, 1:] = np.linalg.inv(np.asarray(reduced, dtype=np.float64))
+            return X[u, u] + X[v, v] - X[u, v] - X[v, u]
+        if method != "approximate":
+            raise ValueError("Unknown method %s." % method)
+
+        from scipy.sparse.linalg import splu, cg, LinearOperator
+        reduced = sparse.csc_matrix(reduced, dtype=np.float64)
+        if solver == "splu":
+            solve = splu(reduced).solve
+        elif solver == "cg":
+            preconditioner = LinearOperator(reduced.shape, matvec=lambda x, d=1 / reduced.diagonal(): d * x)
+
+            def solve(Y):
+                return np.column_stack([cg(reduced, y, M=preconditioner)[0] for y in Y.T])
+        else:
+            raise ValueError("Unknown solver %s." % solver)
+        all_edges = self.edge_list()
+        k = int(np.ceil(24 * np.log(n) / epsilon ** 2))
+        rng = np.random.default_rng(seed)
+        resistances = np.zeros(len(edges))
+        for start in range(0, k, block_size):
+            rows = min(block_size, k - start)
+            Q = rng.choice([-1.0, 1.0], size=(len(all_edges), rows))
+            # Y = B^T Q, column j is the sum of +-1 over edges incident to every node
+            Y = np.zeros((n, rows))
+            np.add.at(Y, all_edges[:, 0], Q)
+            np.subtract.at(Y, all_edges[:, 1], Q)
+            Z = np.zeros((n, rows))
+            Z[1:] = solve(Y[1:])
+            resistances += ((Z[u] - Z[v]) ** 2).sum(axis=1)
+        return resistances / k
+
     def compute_graph(self):
+        """Creating NetworkX graph, edges have 'weight' attributes from weight matrix if it is set (1 otherwise)"""
+        import networkx as nx
         if not self.adjacency_set:
             raise Exception("Adjacency matrix not set. Cannot create graph.")
-        graph = nx.from_numpy_matrix(self.adjacency_matrix)
+        matrix = self.adjacency_matrix if self.weight_matrix is None else self.weight_matrix
+        if sparse.issparse(matrix):
+            graph = nx.from_scipy_sparse_matrix(matrix)
+        else:
+            graph = nx.from_numpy_matrix(matrix)
         return graph
 
-    def compute_remaining_matrices(self):
-        """Compute remaining matrices if adjacency matrix or incidence matrix is set and graph definition is thus complete"""
+    def compute_remaining_matrices(self, count=True):
+        """Compute remaining matrices if adjacency matrix or incidence matrix is set and graph definition is thus complete
+
+        Parameters
+        ----------
+        count : bool, optional
+            Computing the number of spanning trees (adjugate_subdeterminant) as well, by default True.
+            Without it only matrices are computed (e.g. for sampling), a later call with count=True computes just the count.
+        """
 
         if self.matrices_computed:
+            if count and self.adjugate_subdeterminant is None:
+                self._compute_count()
+                return
             print("Matrices already computed. No need to compute again. Skipping.")
             return
         if not self.definition_complete:
             raise Exception("Definition of matrices is not complete.")
+        elif self.cache is not None and self._load_cached_matrices():
+            self.profiler.count("cache_hits")
         elif self.adjacency_set:
-            self.incidence_matrix = self.adjacency2incidence(self.adjacency_matrix)
-            self.degree_matrix = self.degree_matrix(self.adjacency_matrix)
-            self.laplacian_matrix = self.laplacian_matrix(
-                self.adjacency_matrix, self.degree_matrix
-            )
-            self.laplacian_adjugate_matrix = self.laplacian_adjugate_matrix(
-                self.laplacian_matrix
-            )
-            self.adjugate_subdeterminant = int(self.laplacian_adjugate_matrix[0, 0])
+            with self.profiler.timer("matrices"):
+                self.incidence_matrix = self.adjacency2incidence(self.adjacency_matrix)
+                self.degree_matrix = self.degree_matrix(self.adjacency_matrix)
+                self.laplacian_matrix = self.laplacian_matrix(
+                    self.adjacency_matrix, self.degree_matrix
+                )
         elif self.incidence_set:
-            self.adjacency_matrix = self.incidence2adjacency(self.incidence_matrix)
-            self.degree_matrix = self.degree_matrix(self.adjacency_matrix)
-            self.laplacian_matrix = self.laplacian_matrix(
-                self.adjacency_matrix, self.degree_matrix
-            )
-            self.laplacian_adjugate_matrix = self.laplacian_adjugate_matrix(
+            with self.profiler.timer("matrices"):
+                self.adjacency_matrix = self.incidence2adjacency(self.incidence_matrix)
+                self.degree_matrix = self.degree_matrix(self.adjacency_matrix)
+                self.laplacian_matrix = self.laplacian_matrix(
+                    self.adjacency_matrix, self.degree_matrix
+                )
+        # NetworkX graph is created on first access of self.graph
+        self.matrices_computed = True
+        if count and self.adjugate_subdeterminant is None:
+            self._compute_count()
+
+    def _compute_count(self):
+        """Computing number of spanning trees from computed matrices, storing matrices and count in cache"""
+        with self.profiler.timer("count"):
+            self.adjugate_subdeterminant = self.reduced_laplacian_determinant(
                 self.laplacian_matrix
             )
-            self.adjugate_subdeterminant = int(self.laplacian_adjugate_matrix[0, 0])
-            
-        self.graph = self.compute_graph()
-        self.graph_created = True
-        self.matrices_computed = True
-        
+        if self.cache is not None:
+            self._store_cached_matrices()
+
+
+    def _load_cached_matrices(self):
+        """Loading derived matrices and spanning tree count from cache, returns False if they are not cached"""
+        if self.adjacency_set:
+            A = self.adjacency_matrix
+        else:
+            A = self._as_matrix(self.incidence2adjacency(self.incidence_matrix))
+        self.cache_key = self.cache.fingerprint(A.shape[0], self.edge_list(A))
+        count = self.cache.get_count(self.cache_key)
+        cached = {name: self.cache.get_matrix(self.cache_key, name) for name in ("incidence_matrix", "degree_matrix", "laplacian_matrix")}
+        if count is None or any(value is None for value in cached.values()):
+            return False
+        if not self.adjacency_set:
+            self.adjacency_matrix = A
+        if not hasattr(self, "_incidence_matrix"):
+            self.incidence_matrix = cached["incidence_matrix"]
+        self.degree_matrix = self._as_matrix(cached["degree_matrix"])
+        self.laplacian_matrix = self._as_matrix(cached["laplacian_matrix"])
+        self.adjugate_subdeterminant = count
+        return True
+
+    def _store_cached_matrices(self):
+        """Storing derived matrices and spanning tree count in cache"""
+        if self.cache_key is None:
+            self.cache_key = self.cache.fingerprint(self.adjacency_matrix.shape[0], self.edge_list())
+        # count alone may have been cached by SpanningTrees.spanning_trees_count() of a graph with several blocks
+        if self.cache.get_count(self.cache_key) is not None and self.cache.get_matrix(self.cache_key, "laplacian_matrix") is not None:
+            return
+        self.cache.put_matrix(self.cache_key, "incidence_matrix", self.incidence_matrix)
+        self.cache.put_matrix(self.cache_key, "degree_matrix", self.degree_matrix)
+        self.cache.put_matrix(self.cache_key, "laplacian_matrix", self.laplacian_matrix)
+        # count is written last, it marks the entry as complete
+        self.cache.put_count(self.cache_key, self.adjugate_subdeterminant)
+
+    def _as_matrix(self, value):
+        """Converting matrix to int32 CSR matrix in sparse mode or int32 numpy array otherwise (no copy if it already is one)"""
+        if self.sparse:
+            return sparse.csr_matrix(value, dtype=np.int32)
+        if sparse.issparse(value):
+            return value.toarray().astype(np.int32)
+        return np.asarray(value, dtype=np.int32)
+
+    def edge_list(self, adjacency_matrix=None):
+        """Integer edge list (u, v) with u <= v in the order of incidence matrix columns, as numpy array of shape (m, 2)
+
+        Parameters
+        ----------
+        adjacency matrix : numpy array or scipy.sparse matrix, optional
+            By default adjacency matrix of the graph
+        """
+        if adjacency_matrix is None:
+            if not self.adjacency_set:
+                raise Exception("Adjacency matrix not set. Cannot create edge list.")
+            adjacency_matrix = self.adjacency_matrix
+        if sparse.issparse(adjacency_matrix):
+            upper = sparse.triu(adjacency_matrix, format="csr")
+            upper.sort_indices()
+            rows = np.repeat(np.arange(upper.shape[0]), np.diff(upper.indptr))
+            hit = upper.data == 1
+            return np.column_stack([rows[hit], upper.indices[hit]])
+        connected = adjacency_matrix == 1
+        return np.argwhere(np.triu(connected | connected.T))
 
     @property
     def adjacency_matrix(self):
-        """Adjacency matrix property for graph matrix"""
-        return np.array(self._adjacency_matrix, dtype=np.int32)
+        """Adjacency matrix property for graph matrix, returned without copying"""
+        return self._adjacency_matrix
 
     @adjacency_matrix.setter
     def adjacency_matrix(self, value):
         """Adjacency matrix property setter and computation of the rest for graph matrix"""
-        self._adjacency_matrix = value
+        self._adjacency_matrix = self._as_matrix(value)
         self.adjacency_set = True
         self.definition_complete = True
 
     @property
     def incidence_matrix(self):
-        """Incidence matrix property for graph matrix"""
-        return np.array(self._incidence_matrix, dtype=np.int32)
+        """Incidence matrix property for graph matrix, returned without copying"""
+        return self._incidence_matrix
 
     @incidence_matrix.setter
     def incidence_matrix(self, value):
         """Incidence matrix property setter and computation of the rest for graph matrix"""
-        self._incidence_matrix = value
+        self._incidence_matrix = self._as_matrix(value)
         self.incidence_set = True
         self.definition_complete = True
         
     @property
     def graph(self):
+        """NetworkX graph, created from adjacency (or weight) matrix on first access"""
+        if not self.graph_created:
+            with self.profiler.timer("graph"):
+                self.graph = self.compute_graph()
         return self._graph
     
     @graph.setter
     def graph(self, value):
         self._graph = value
-        self.my_pos = nx.spring_layout(self._graph)
+        self._my_pos = None
         self.graph_created = True
+
+    @property
+    def my_pos(self):
+        """Layout of the graph used for drawing, computed on first use"""
+        if getattr(self, "_my_pos", None) is None:
+            import networkx as nx
+            with self.profiler.timer("layout"):
+                self._my_pos = nx.spring_layout(self.graph)
+        return self._my_pos
+
+    @my_pos.setter
+    def my_pos(self, value):
+        self._my_pos = value
     
-    def load(self, filename, mode="adjacency"):
-        """Load adjacency or incidence matrix from .csv file
+    def load(self, filename, mode="adjacency", weighted=False, num_nodes=None, mmap=False, chunksize=1000000, count=True):
+        """Load adjacency or incidence matrix, or edge list. Format is given by extension of filename:
+        .csv (matrix with header row and index column as written by save_csv(), or edge list in 'edges' mode),
+        .npy (numpy array), .npz (scipy.sparse matrix or numpy archive, see save()), other extensions are read as edge list text.
+        Edge lists and sparse matrices are never turned into dense matrices in sparse mode.
 
         Parameters
         ----------
         filename : str
         mode : str
+            'adjacency', 'incidence' or 'edges' (one edge 'u v' or 'u,v' per line, optionally with weight, see save())
+        weighted : bool, optional
+            Adjacency matrix holds edge weights (every nonzero entry is an edge), or edge list has weights in the third column,
+            by default False
+        num_nodes : int, optional
+            Number of nodes of edge list, by default given by '# nodes N' comment or by the largest node index
+        mmap : bool, optional
+            Memory-mapping .npy files instead of reading them, in sparse mode they are converted by blocks of rows, by default False
+        chunksize : int, optional
+            Number of lines of edge list text parsed at once, by default 1000000
+        count : bool, optional
+            Computing the exact number of spanning trees right away, by default True.
+            Sampling and approximate edge frequencies do not need it, for large graphs it is the most expensive step
+            (see compute_remaining_matrices())
         """
-        if mode == "adjacency":
-            self.adjacency_matrix = pd.read_csv(filename, header=0, index_col=0).to_numpy(dtype=np.int32)
-            print("1) Adjacency matrix loaded.")
-        elif mode == "incidence":
-            self.incidence_matrix = pd.read_csv(filename, header=0, index_col=0).to_numpy(dtype=np.int32)
-            print("1) Incidence matrix loaded.")
-        else:
+        if weighted and mode == "incidence":
+            raise Exception("Weights are supported only for adjacency matrix.")
+        if mode not in ("adjacency", "incidence", "edges"):
             raise Exception("Mode not supported.")
+        with self.profiler.timer("load"):
+            if mode == "edges":
+                edges, weights, stored_num_nodes = _read_edge_list(filename, chunksize=chunksize, mmap=mmap)
+                if num_nodes is None:
+                    num_nodes = stored_num_nodes if stored_num_nodes is not None else int(edges.max()) + 1 if len(edges) else 0
+                if weighted:
+                    self.set_weighted_adjacency(_edges_to_matrix(num_nodes, edges, weights if weights is not None else np.ones(len(edges))))
+                    print("1) Weighted edge list loaded.")
+                else:
+                    A = _edges_to_matrix(num_nodes, edges, np.ones(len(edges), dtype=np.int32))
+                    A.data[:] = 1
+                    self.adjacency_matrix = A
+                    print("1) Edge list loaded.")
+            else:
+                dtype = np.float64 if weighted else np.int32
+                matrix = _read_matrix(filename, dtype, mmap=mmap)
+                if self.sparse and not sparse.issparse(matrix):
+                    matrix = _dense_to_csr(matrix, dtype)
+                if weighted:
+                    self.set_weighted_adjacency(matrix)
+                    print("1) Weighted adjacency matrix loaded.")
+                elif mode == "adjacency":
+                    self.adjacency_matrix = matrix
+                    print("1) Adjacency matrix loaded.")
+                else:
+                    self.incidence_matrix = matrix
+                    print("1) Incidence matrix loaded.")
         try:
-            self.compute_remaining_matrices()
+            self.compute_remaining_matrices(count=count)
             print("2) Remaining matrices computed.")
         except Exception as e:
             print(f"Input in {filename} with input mode {mode} is not valid or cannot be computed. Raising error: {e}")
 
+    def set_weighted_adjacency(self, weight_matrix):
+        """Setting symmetric matrix of edge weights, every nonzero entry is an edge of the graph
+
+        Parameters
+        ----------
+        weight_matrix : numpy array or scipy.sparse matrix
+        """
+        if sparse.issparse(weight_matrix):
+            W = sparse.csr_matrix(weight_matrix, dtype=np.float64)
+            W.eliminate_zeros()
+            A = W.copy()
+            A.data = np.ones_like(A.data)
+            if not self.sparse:
+                W = W.toarray()
+        else:
+            W = np.asarray(weight_matrix, dtype=np.float64)
+            A = (W != 0)
+            if self.sparse:
+                W = sparse.csr_matrix(W)
+        self.adjacency_matrix = A
+        self.weight_matrix = W
+
+    def add_edge(self, u, v, weight=1):
+        """Adding edge (u, v) between existing nodes, derived matrices and number of spanning trees are updated
+        in O(k n^2) for k = O(n) primes instead of being recomputed (see DynamicLaplacian). Graphs whose inverses
+        would exceed the memory budget of DynamicLaplacian are counted from scratch after every change instead.
+
+        Parameters
+        ----------
+        u, v : int
+            Node indices
+        weight : float, optional
+            Weight of the edge if weight matrix is set, by default 1
+        """
+        self._change_edge(u, v, 1, weight)
+
+    def remove_edge(self, u, v):
+        """Removing edge (u, v), derived matrices and number of spanning trees are updated (see add_edge())"""
+        self._change_edge(u, v, -1)
+
+    def _change_edge(self, u, v, change, weight=1):
+        if not self.matrices_computed:
+            self.compute_remaining_matrices()
+        if u == v:
+            raise ValueError("Loops are not supported.")
+        present = self.adjacency_matrix[u, v] != 0
+        if change > 0 and present:
+            raise ValueError("Edge (%d, %d) already exists." % (u, v))
+        if change < 0 and not present:
+            raise ValueError("Edge (%d, %d) does not exist." % (u, v))
+        if self.dynamic is None and not self.dynamic_refused:
+            from spanning_trees_search.DynamicLaplacian import DynamicLaplacian
+            try:
+                self.dynamic = DynamicLaplacian(self.laplacian_matrix)
+            except ValueError as e:
+                self._refuse_dynamic(e)
+
+        value = 1 if change > 0 else 0
+        self.adjacency_matrix = self._set_symmetric_entry(self.adjacency_matrix, u, v, value)
+        if self.weight_matrix is not None:
+            self.weight_matrix = self._set_symmetric_entry(self.weight_matrix, u, v, weight * value)
+        # degree_matrix and laplacian_matrix methods are shadowed by the computed matrices
+        self.incidence_matrix = self.adjacency2incidence(self.adjacency_matrix)
+        self.degree_matrix = GraphMatrix.degree_matrix(self, self.adjacency_matrix)
+        self.laplacian_matrix = GraphMatrix.laplacian_matrix(self, self.adjacency_matrix, self.degree_matrix)
+        if self.dynamic is not None:
+            self.dynamic.update(u, v, change)
+            try:
+                self.adjugate_subdeterminant = self.dynamic.count()
+            except ValueError as e:
+                self._refuse_dynamic(e)
+        if self.dynamic is None:
+            with self.profiler.timer("count"):
+                self.adjugate_subdeterminant = self.reduced_laplacian_determinant(self.laplacian_matrix)
+        self.cache_key = None
+        self.graph_created = False
+
+    def _refuse_dynamic(self, error):
+        """Counting from scratch after every change from now on, as incremental count does not fit into memory"""
+        print(f"{error} Counting from scratch after every change.")
+        self.dynamic = None
+        self.dynamic_refused = True
+
+    @staticmethod
+    def _set_symmetric_entry(matrix, u, v, value):
+        """Copy of matrix with entries (u, v) and (v, u) set to value, matrix itself may be owned by the caller
+        (adjacency setter does not copy) or read-only (memory-mapped input)"""
+        if not sparse.issparse(matrix):
+            matrix = np.array(matrix)
+            matrix[u, v] = matrix[v, u] = value
+            return matrix
+        matrix = matrix.tolil()
+        matrix[u, v] = matrix[v, u] = value
+        matrix = sparse.csr_matrix(matrix)
+        matrix.eliminate_zeros()
+        return matrix
+
     def preview(self):
         """Previewing a graph"""
-        g = nx.from_numpy_matrix(self.adjacency_matrix)
+        import networkx as nx
+        g = self.compute_graph()
         nx.draw(g, with_labels=True, node_color='pink')
     
     def save_figure(self, filename="graph.png", pos = 'default'):
         """Saving image of the graph"""
-        if not self.graph_created:
-            self.graph = self.compute_graph()
+        import networkx as nx
+        import matplotlib.pyplot as plt
         if pos == 'default':
             nx.draw(self.graph, with_labels=True, node_color='pink', pos = self.my_pos)
         else:
@@ -214,5 +1138,65 @@ class GraphMatrix:
         """Saving adjacency matrix csv of the graph"""
         if not self.adjacency_set:
             raise ValueError("Adjacency matrix not set. Cannot save csv.")
-        df = pd.DataFrame(self.adjacency_matrix)
+        import pandas as pd
+        A = self.adjacency_matrix
+        df = pd.DataFrame(A.toarray() if sparse.issparse(A) else A)
         df.to_csv(filename)
+
+    def save(self, filename, mode="adjacency"):
+        """Saving graph in format given by extension of filename, counterpart of load()
+        .csv: matrix with header row and index column, or edge list 'u,v[,weight]' with header in 'edges' mode
+        .npy: dense matrix, or array of edges of shape (m, 2) (float (m, 3) with weights) in 'edges' mode
+        .npz: scipy.sparse matrix (sparse.save_npz()), or arrays 'edges', 'num_nodes' (and 'weights') in 'edges' mode
+        other extensions (e.g. .txt, .edges): edge list with one 'u v [weight]' per line in any mode
+        Edge lists start with '# nodes N' comment (text) or keep num_nodes (.npz), weights are saved if weight matrix is set.
+
+        Parameters
+        ----------
+        filename : str
+        mode : str, optional
+            'adjacency', 'incidence' or 'edges', by default 'adjacency'
+        """
+        if not self.definition_complete:
+            raise ValueError("Graph is not set. Cannot save.")
+        if mode not in ("adjacency", "incidence", "edges"):
+            raise ValueError("Mode %s not supported." % mode)
+        is_text = not (filename.endswith(".csv") or filename.endswith(".npy") or filename.endswith(".npz"))
+        A = self.adjacency_matrix if self.adjacency_set else self.incidence2adjacency(self.incidence_matrix)
+        if mode == "edges" or is_text:
+            edges = self.edge_list(A)
+            num_nodes = A.shape[0]
+            weights = None
+            if self.weight_matrix is not None:
+                weights = np.asarray(self.weight_matrix[edges[:, 0], edges[:, 1]], dtype=np.float64).ravel()
+            if filename.endswith(".npy"):
+                np.save(filename, edges if weights is None else np.column_stack([edges, weights]))
+            elif filename.endswith(".npz"):
+                arrays = {"edges": edges, "num_nodes": num_nodes}
+                if weights is not None:
+                    arrays["weights"] = weights
+                np.savez_compressed(filename, **arrays)
+            else:
+                delimiter = "," if filename.endswith(".csv") else " "
+                header = "# nodes %d\n" % num_nodes
+                if filename.endswith(".csv"):
+                    header += "u,v,weight\n" if weights is not None else "u,v\n"
+                with open(filename, "w") as f:
+                    f.write(header)
+                    if weights is None:
+                        np.savetxt(f, edges, delimiter=delimiter, fmt="%d")
+                    else:
+                        np.savetxt(f, np.column_stack([edges, weights]), delimiter=delimiter, fmt=["%d", "%d", "%.17g"])
+            return
+        if mode == "adjacency":
+            matrix = A if self.weight_matrix is None else self.weight_matrix
+        elif hasattr(self, "_incidence_matrix"):
+            matrix = self.incidence_matrix
+        else:
+            matrix = self.adjacency2incidence(A)
+        if filename.endswith(".npy"):
+            np.save(filename, matrix.toarray() if sparse.issparse(matrix) else np.asarray(matrix))
+        elif filename.endswith(".npz"):
+            sparse.save_npz(filename, sparse.csr_matrix(matrix))
+        else:
+            _write_csv_matrix(filename, matrix)
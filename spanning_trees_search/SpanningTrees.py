@@ -2,70 +2,272 @@
 import networkx as nx
 import numpy as np
 from spanning_trees_search.GraphMatrix import GraphMatrix
+from spanning_trees_search.TreeEnumerator import TreeEnumerator, UnionFind
+from spanning_trees_search.TreeSampler import TreeSampler
+from spanning_trees_search.TreeRanker import TreeRanker
+from spanning_trees_search.BlockDecomposition import BlockDecomposition
+from spanning_trees_search.Profiler import Profiler
+from spanning_trees_search.SpanningTreesFile import SpanningTreesWriter, SpanningTreesReader
 import random
-import matplotlib.pyplot as plt
 import os
-import pandas as pd
-import imageio
-from tqdm import tqdm
+import itertools
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+# matplotlib, pandas, imageio and tqdm are imported where they are used,
+# so that counting and enumeration do not pay for importing plotting and export dependencies
+
+
+# Shared export settings of a worker process, set once by _init_export_worker()
+_export_context = None
+
+
+def _init_export_worker(context):
+    """Initializer of export worker processes"""
+    global _export_context
+    _export_context = context
+
+
+def _export_tree_chunk(start, chunk, context=None):
+    """Writing png image and adjacency csv of each spanning tree (given by edge IDs) in chunk, numbered from start.
+    Returns (number of trees, seconds of rendering images, seconds of writing csv files)
+
+    Parameters
+    ----------
+    start : int
+        Index of the first tree in chunk
+    chunk : list of tuple
+        Spanning trees as tuples of edge IDs
+    context : dict, optional
+        Export settings (nodes, edges, pos, output directories), by default taken from worker initializer
+    """
+    import matplotlib.pyplot as plt
+    import pandas as pd
+    if context is None:
+        context = _export_context
+    nodes = context["nodes"]
+    edges = context["edges"]
+    render_seconds = csv_seconds = 0.0
+    for i, edge_ids in enumerate(chunk, start):
+        start_time = time.perf_counter()
+        T = nx.Graph()
+        T.add_nodes_from(nodes)
+        T.add_edges_from((nodes[edges[e][0]], nodes[edges[e][1]]) for e in edge_ids)
+        nx.draw(T, with_labels=True, node_color='pink', pos = context["pos"])
+        plt.savefig(os.path.join(context["image_output_directory"], "spanning_tree_" + str(i).zfill(3) + ".png"))
+        plt.close()
+        render_time = time.perf_counter()
+        A = np.zeros((len(nodes), len(nodes)), dtype=np.int32)
+        for e in edge_ids:
+            u, v = edges[e]
+            A[u, v] = A[v, u] = 1
+        pd.DataFrame(A).to_csv(os.path.join(context["csv_output_directory"], "spanning_tree_adjacency_" + str(i).zfill(3) + ".csv"))
+        render_seconds += render_time - start_time
+        csv_seconds += time.perf_counter() - render_time
+    return len(chunk), render_seconds, csv_seconds
+
+# Graph of a search worker process, set once by _init_search_worker()
+_search_context = None
+
+
+def _init_search_worker(context):
+    """Initializer of parallel enumeration worker processes"""
+    global _search_context
+    _search_context = context
+
+
+def _enumerate_subproblem(included, excluded):
+    """All spanning trees containing included edges and avoiding excluded edges, as int32 array with one tree per row"""
+    trees = list(TreeEnumerator(_search_context["num_nodes"], _search_context["edges"], included, excluded))
+    return np.array(trees, dtype=np.int32).reshape(len(trees), max(_search_context["num_nodes"] - 1, 0))
 
 class SpanningTrees:
-    """ Class for searching and visualising spanning trees"""
+    """ Class for searching and visualising spanning trees
+    
+    Parameters
+    ----------
+    nx_graph : networkx.Graph
+        Edge attribute 'weight' is used by k_best_spanning_trees() (1 if missing)
+    seed : int, optional
+        Random seed, by default 42
+    sparse : bool, optional
+        Storing graph matrices as scipy.sparse matrices (see GraphMatrix), by default False
+    cache : GraphCache, optional
+        Cache of matrices, counts and (if enabled in cache) enumerated trees, by default None
+    profile : bool or Profiler, optional
+        Collecting counters and timers of count, search and export into self.profiler (see Profiler), by default False
+    """
     
-    def __init__(self, nx_graph, seed=42):
+    def __init__(self, nx_graph, seed=42, sparse=False, cache=None, profile=False):
         self.nx_graph = nx_graph
         self.seed = seed
-        self.graph_matrix = GraphMatrix()
-        self.graph_matrix.adjacency_matrix = np.array(nx.adjacency_matrix(self.nx_graph).todense())
-        self.my_pos = nx.spring_layout(self.nx_graph)
+        self.cache = cache
+        self.profiler = profile if isinstance(profile, Profiler) else Profiler(enabled=bool(profile))
+        self.graph_matrix = GraphMatrix(sparse=sparse, cache=cache, profiler=self.profiler)
+        if sparse:
+            self.graph_matrix.adjacency_matrix = nx.adjacency_matrix(self.nx_graph, weight=None)
+        else:
+            self.graph_matrix.adjacency_matrix = np.array(nx.adjacency_matrix(self.nx_graph, weight=None).todense())
+        self._my_pos = None
         self.spanning_trees = []
         self.export_directory_path = None
         self.graph_png_filename = None
         self.graph_csv_filename = None
         self.csv_output_directory = None
         self.image_output_directory = None
+        self.binary_filename = None
         self.spanning_trees_exported = False
+        self.exported_trees = None
         self.spanning_trees_num = 0
+        # Integer labelling of nodes and edges used by the enumeration engine
+        self.nodes = list(self.nx_graph.nodes())
+        node_index = {node: i for i, node in enumerate(self.nodes)}
+        self.edges = [(node_index[u], node_index[v]) for u, v in self.nx_graph.edges()]
+        self.weights = [d.get("weight", 1) for _, _, d in self.nx_graph.edges(data=True)]
+        self._blocks = None
         
         
-    def spanning_trees_count(self):
-        """Counts number of spanning trees in the graph via Kirchoff's theorem"""
+    @property
+    def my_pos(self):
+        """Layout of the graph shared by all drawings, computed by spring layout on first draw (can be set to custom positions)"""
+        if self._my_pos is None:
+            with self.profiler.timer("layout"):
+                self._my_pos = nx.spring_layout(self.nx_graph)
+        return self._my_pos
+
+    @my_pos.setter
+    def my_pos(self, value):
+        self._my_pos = value
+
+    @property
+    def blocks(self):
+        """Biconnected blocks and bridges of the graph (see BlockDecomposition), computed on first use"""
+        if self._blocks is None:
+            self._blocks = BlockDecomposition(len(self.nodes), self.edges)
+        return self._blocks
+
+    def spanning_trees_count(self, method="auto", decompose=True, required_edges=None, forbidden_edges=None):
+        """Counts number of spanning trees in the graph via Kirchoff's theorem
+        
+        Parameters
+        ----------
+        method : str, optional
+            Exact determinant method, by default 'auto'
+            Available options: 'auto', 'bareiss', 'modular' (see GraphMatrix.reduced_laplacian_determinant())
+        decompose : bool, optional
+            Counting biconnected blocks separately and multiplying the counts (see BlockDecomposition), by default True.
+            Graphs with a single block are counted as a whole.
+        required_edges, forbidden_edges : iterable of (node, node), optional
+            Counting only spanning trees containing all required edges and none of forbidden edges, by default None.
+            Count is the determinant of the reduced Laplacian of the graph with required edges contracted and forbidden
+            edges deleted (see GraphMatrix.constrained_spanning_trees_count()), it is returned without changing
+            self.spanning_trees_num (number of all spanning trees).
+        """
+        included, excluded = self._constraint_edge_ids(required_edges, forbidden_edges)
+        decomposed = decompose and self.blocks.num_parts > 1
+        if included or excluded or decomposed:
+            # product of blocks is cached under the fingerprint of the whole graph, as GraphMatrix caches its count
+            cached = decomposed and not (included or excluded) and self.cache is not None
+            count = None
+            if cached:
+                key = self.cache.fingerprint(len(self.nodes), self.edges)
+                count = self.cache.get_count(key)
+                if count is not None:
+                    self.profiler.count("cache_hits")
+            if count is None:
+                with self.profiler.timer("count"):
+                    if decomposed:
+                        count = self.blocks.count(
+                            lambda *block: self.graph_matrix.constrained_spanning_trees_count(*block, method=method), included, excluded)
+                    else:
+                        count = self.graph_matrix.constrained_spanning_trees_count(len(self.nodes), self.edges, included, excluded, method=method)
+                if cached:
+                    self.cache.put_count(key, count)
+            if included or excluded:
+                return count
+            self.spanning_trees_num = count
+            return self.spanning_trees_num
         self.graph_matrix.compute_remaining_matrices()
-        self.spanning_trees_num = self.graph_matrix.adjugate_subdeterminant
+        if method == "auto":
+            self.spanning_trees_num = self.graph_matrix.adjugate_subdeterminant
+        else:
+            self.spanning_trees_num = self.graph_matrix.reduced_laplacian_determinant(self.graph_matrix.laplacian_matrix, method=method)
         return self.spanning_trees_num
+
+    def spanning_trees_log_count(self):
+        """Estimates natural logarithm of the number of spanning trees in floating point, for graphs too large for exact count"""
+        self.graph_matrix.compute_remaining_matrices()
+        return self.graph_matrix.laplacian_log_determinant(self.graph_matrix.laplacian_matrix)
         
+    def add_edge(self, u, v, weight=1):
+        """Adding edge (u, v) between existing nodes, returns updated number of spanning trees.
+        Count is updated incrementally in O(k n^2) for k = O(n) primes (see GraphMatrix.add_edge()), enumerated trees are discarded."""
+        self._change_edge(u, v, weight)
+        return self.spanning_trees_num
+
+    def remove_edge(self, u, v):
+        """Removing edge (u, v), returns updated number of spanning trees (see add_edge())"""
+        self._change_edge(u, v, None)
+        return self.spanning_trees_num
+
+    def _change_edge(self, u, v, weight):
+        for node in (u, v):
+            if node not in self.nx_graph:
+                raise ValueError("Node %s is not in the graph." % (node,))
+        node_index = {node: i for i, node in enumerate(self.nodes)}
+        if weight is None:
+            self.graph_matrix.remove_edge(node_index[u], node_index[v])
+            self.nx_graph.remove_edge(u, v)
+        else:
+            self.graph_matrix.add_edge(node_index[u], node_index[v])
+            self.nx_graph.add_edge(u, v, weight=weight)
+        self.edges = [(node_index[a], node_index[b]) for a, b in self.nx_graph.edges()]
+        self.weights = [d.get("weight", 1) for _, _, d in self.nx_graph.edges(data=True)]
+        self.spanning_trees_num = self.graph_matrix.adjugate_subdeterminant
+        self.spanning_trees = []
+        self.exported_trees = None
+        self._blocks = None
+
     def preview(self):
         """Previewing a graph"""
+        import matplotlib.pyplot as plt
         nx.draw(self.nx_graph, with_labels=True, node_color='pink', pos = self.my_pos)
         plt.show()
     
     def save_figure(self, filename="graph.png"):
         """Saving image of the graph"""
+        import matplotlib.pyplot as plt
         nx.draw(self.nx_graph, with_labels=True, node_color='pink', pos = self.my_pos)
         plt.savefig(filename)
         plt.close()
 
     def save_csv(self, filename="graph.csv"):
         """Saving adjacency matrix csv of the graph"""
+        import pandas as pd
         if not self.graph_matrix.adjacency_set:
             raise ValueError("Adjacency matrix not set. Cannot save csv.")
-        df = pd.DataFrame(self.graph_matrix.adjacency_matrix)
+        A = self.graph_matrix.adjacency_matrix
+        df = pd.DataFrame(A.toarray() if self.graph_matrix.sparse else A)
         df.to_csv(filename)
     
     def check_cycle(self, edges_list):
-        """Checking if there is a cycle in the graph by traversing list of edges"""
-        start = edges_list[0]
-        e1 = start
-        c = 0
-        while True:
-            next_edge_index = [i for i, e in enumerate(edges_list) if e[0] == e1[1]]
-            if len(next_edge_index) == 1:
-                e1 = edges_list[next_edge_index[0]]
-                c+=1
-            else:
-                return False, 0
-            if e1 == start:
+        """Checking if there is a cycle in the (undirected) graph given by list of edges via union-find
+        Returns (True, number of edges up to the one closing the cycle) or (False, 0)"""
+        index = {}
+        uf = UnionFind(2 * len(edges_list))
+        for c, (u, v) in enumerate(edges_list, 1):
+            a = index.setdefault(u, len(index))
+            b = index.setdefault(v, len(index))
+            if not uf.union(a, b):
                 return True, c
+        return False, 0
+
+    def tree_graph(self, edge_ids):
+        """Creating NetworkX spanning tree (with all nodes of the graph) from tuple of edge IDs"""
+        T = nx.Graph()
+        T.add_nodes_from(self.nx_graph.nodes(data=True))
+        T.add_edges_from((self.nodes[self.edges[i][0]], self.nodes[self.edges[i][1]]) for i in edge_ids)
+        return T
 
     def is_tree(self, G):
         """Checking if graph is tree"""
@@ -87,13 +289,266 @@ class SpanningTrees:
         G.add_edges_from(edges_list)
         return nx.is_connected(G)
     
-    def export_spanning_trees(self, save_path="/test/run"):
+    def iter_spanning_trees(self, representation="edge_ids", workers=1, tasks_per_worker=8, max_task_trees=100000,
+                            required_edges=None, forbidden_edges=None):
+        """Lazily yielding spanning trees one by one, without storing them
+        
+        Parameters
+        ----------
+        representation : str, optional
+            Representation of yielded trees, by default 'edge_ids'
+            Available options:
+                'edge_ids': sorted tuple of indices into self.edges
+                'bitmask': int with bit i set if edge self.edges[i] is in the tree
+        workers : int, optional
+            Number of processes enumerating disjoint parts of the search tree, by default 1 (no process pool)
+        tasks_per_worker : int, optional
+            Number of parts per process the search tree is split into (with workers > 1), by default 8
+        max_task_trees : int, optional
+            Maximal number of trees of one part (with workers > 1), by default 100000
+        required_edges, forbidden_edges : iterable of (node, node), optional
+            Yielding only spanning trees containing all required edges and none of forbidden edges, by default None.
+            Required edges are contracted and forbidden edges deleted before the search starts (see TreeEnumerator),
+            so no part of the search outside of the constrained trees is visited.
+        
+        Memory used by the generator is bounded by the size of the graph, not by the number of trees
+        (with workers > 1 by a few parts of max_task_trees trees). Trees come in the same order for any number of workers.
+        Graphs with more than one biconnected block are enumerated block by block and trees are streamed
+        as the product of trees of blocks (see BlockDecomposition), workers then enumerate the largest block.
+        Use tree_graph() to turn edge IDs into NetworkX graph.
+        With profiling, time spent producing trees is collected as 'search' (search counters only in the calling process).
+        """
+        if representation not in ("edge_ids", "bitmask"):
+            raise ValueError("Representation %s not supported." % representation)
+        profiler = self.profiler if self.profiler.enabled else None
+        included, excluded = self._constraint_edge_ids(required_edges, forbidden_edges)
+        constrained = bool(included or excluded)
+        if self.cache is not None and self.cache.store_trees and len(self.nodes) > 1 and not constrained:
+            trees = self._cached_spanning_trees()
+        elif self.blocks.num_parts > 1:
+            first_block_trees = None
+            constraints = self.blocks.block_constraints(included, excluded)
+            if workers > 1 and self.blocks.blocks and constraints is not None:
+                num_nodes, edges = self.blocks.block_graph(self.blocks.blocks[0])
+                first_block_trees = self._parallel_spanning_trees(workers, tasks_per_worker, max_task_trees, num_nodes, edges,
+                                                                  *constraints[0])
+            trees = self.blocks.iter_trees(first_block_trees, profiler=profiler, included=included, excluded=excluded)
+        elif workers > 1:
+            trees = self._parallel_spanning_trees(workers, tasks_per_worker, max_task_trees, included=included, excluded=excluded)
+        else:
+            trees = TreeEnumerator(len(self.nodes), self.edges, included, excluded, profiler=profiler)
+        if profiler is not None:
+            trees = self._profiled_trees(trees)
+        for edge_ids in trees:
+            if representation == "bitmask":
+                mask = 0
+                for i in edge_ids:
+                    mask |= 1 << i
+                yield mask
+            else:
+                yield edge_ids
+
+    def _profiled_trees(self, trees):
+        """Passing trees through, time spent waiting for the next tree is added to timer 'search'"""
+        iterator = iter(trees)
+        while True:
+            start = time.perf_counter()
+            edge_ids = next(iterator, None)
+            self.profiler.add_time("search", time.perf_counter() - start)
+            if edge_ids is None:
+                return
+            self.profiler.count("trees")
+            yield edge_ids
+
+    def _search_subproblems(self, target, num_nodes=None, edges=None, count=None, included=(), excluded=()):
+        """Splitting the contraction/deletion search tree (see TreeEnumerator) into disjoint parts of at most target trees.
+        Yields (count, included, excluded) in the order in which serial enumeration visits the parts.
+        Size of every part is its Kirchhoff count, the count of the excluding child is the count of the parent
+        minus the count of the including child, so one determinant is computed per split.
+        Graph is given by num_nodes, edges and its count, by default the whole graph.
+        Search starts from the node with given included and excluded edges (count is then the count of that node)."""
+        if edges is None:
+            num_nodes, edges, count = len(self.nodes), self.edges, self.spanning_trees_num
+        n = num_nodes
+        fixed = set(included) | set(excluded)
+        stack = [(count, 0, tuple(included), tuple(excluded))]
+        while stack:
+            count, i, included, excluded = stack.pop()
+            while i < len(edges) and i in fixed:
+                i += 1
+            if count <= target or len(included) == n - 1 or i == len(edges):
+                yield count, included, excluded
+                continue
+            include_count = self.graph_matrix.constrained_spanning_trees_count(n, edges, included + (i,), excluded)
+            # including child goes first, as in serial enumeration
+            if count - include_count > 0:
+                stack.append((count - include_count, i + 1, included, excluded + (i,)))
+            if include_count > 0:
+                stack.append((include_count, i + 1, included + (i,), excluded))
+
+    def _parallel_spanning_trees(self, workers, tasks_per_worker=8, max_task_trees=100000, num_nodes=None, edges=None,
+                                 included=(), excluded=()):
+        """Enumerating parts of the search tree balanced by their Kirchhoff counts on a process pool,
+        results are merged in the order of serial enumeration. Graph is given by num_nodes and edges, by default the whole graph,
+        only its trees containing included edges and avoiding excluded edges are enumerated."""
+        if edges is None and not (included or excluded):
+            if self.spanning_trees_num == 0:
+                self.spanning_trees_count()
+            num_nodes, edges, count = len(self.nodes), self.edges, self.spanning_trees_num
+        else:
+            if edges is None:
+                num_nodes, edges = len(self.nodes), self.edges
+            count = self.graph_matrix.constrained_spanning_trees_count(num_nodes, edges, included, excluded)
+        if count == 0:
+            return
+        target = max(1, min(-(-count // (workers * tasks_per_worker)), max_task_trees))
+        context = {"num_nodes": num_nodes, "edges": edges}
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_search_worker, initargs=(context,))
+        try:
+            pending = deque()
+            for _, part_included, part_excluded in self._search_subproblems(target, num_nodes, edges, count, included, excluded):
+                self.profiler.count("search_parts")
+                pending.append(executor.submit(_enumerate_subproblem, part_included, part_excluded))
+                # bounding number of parts waiting in memory
+                if len(pending) >= 4 * workers:
+                    yield from map(tuple, pending.popleft().result().tolist())
+            while pending:
+                yield from map(tuple, pending.popleft().result().tolist())
+        finally:
+            executor.shutdown(cancel_futures=True)
+
+    def sample_spanning_trees(self, k, seed=None, representation="edge_ids"):
+        """Sampling k uniformly random spanning trees by Wilson's algorithm (see TreeSampler)
+        Useful when there are too many spanning trees to enumerate them all. Trees may repeat.
+        
+        Parameters
+        ----------
+        k : int
+            Number of sampled trees
+        seed : int, optional
+            Random seed, by default self.seed
+        representation : str, optional
+            Representation of returned trees, 'edge_ids' or 'bitmask' (see iter_spanning_trees()), by default 'edge_ids'
+        """
+        if representation not in ("edge_ids", "bitmask"):
+            raise ValueError("Representation %s not supported." % representation)
+        if seed is None:
+            seed = self.seed
+        trees = list(TreeSampler(len(self.nodes), self.edges, seed=seed).sample(k))
+        if representation == "bitmask":
+            return [sum(1 << i for i in edge_ids) for edge_ids in trees]
+        return trees
+
+    def k_best_spanning_trees(self, k, maximum=False):
+        """Finding k spanning trees with the lowest total weight (or the highest if maximum=True) in ranked order
+        Trees are ranked by Lawler's partition scheme over Kruskal's algorithm (see TreeRanker),
+        its cost grows with k, not with the total number of spanning trees. k=1 gives minimum spanning tree.
+        
+        Parameters
+        ----------
+        k : int
+            Number of trees
+        maximum : bool, optional
+            Ranking from the maximum weight tree, by default False
+        
+        Returns list of (total weight, sorted tuple of edge IDs)
+        """
+        if maximum:
+            ranker = TreeRanker(len(self.nodes), self.edges, [-w for w in self.weights])
+            return [(-weight, edge_ids) for weight, edge_ids in ranker.k_best(k)]
+        return TreeRanker(len(self.nodes), self.edges, self.weights).k_best(k)
+
+    def edge_tree_frequencies(self, method="auto", epsilon=0.3, solver="splu"):
+        """Fraction of spanning trees containing each edge, computed from effective resistances without enumeration
+        (see GraphMatrix.edge_tree_frequencies()), returns numpy array indexed by edge ID"""
+        return self.graph_matrix.edge_tree_frequencies(np.array(self.edges, dtype=np.int64), method=method,
+                                                       epsilon=epsilon, solver=solver, seed=self.seed)
+
+    def tree_edge_ids(self, T):
+        """Sorted tuple of edge IDs (indices into self.edges) of a subgraph T, inverse of tree_graph()"""
+        return self.edge_ids(T.edges())
+
+    def edge_ids(self, edges_list):
+        """Sorted tuple of edge IDs (indices into self.edges) of edges given by their nodes, in any orientation.
+        Raises ValueError for a pair of nodes which is not an edge of the graph."""
+        node_index = {node: i for i, node in enumerate(self.nodes)}
+        edge_index = {}
+        for i, (u, v) in enumerate(self.edges):
+            edge_index[(u, v)] = edge_index[(v, u)] = i
+        ids = []
+        for u, v in edges_list:
+            key = (node_index.get(u), node_index.get(v))
+            if key not in edge_index:
+                raise ValueError("Edge (%s, %s) is not in the graph." % (u, v))
+            ids.append(edge_index[key])
+        return tuple(sorted(ids))
+
+    def _constraint_edge_ids(self, required_edges=None, forbidden_edges=None):
+        """Edge IDs of required and forbidden edges (see spanning_trees_count()), empty tuples if not given"""
+        return (self.edge_ids(required_edges) if required_edges is not None else (),
+                self.edge_ids(forbidden_edges) if forbidden_edges is not None else ())
+
+    def _cached_spanning_trees(self):
+        """Reading spanning trees from cache, or enumerating them and storing them in cache once enumeration finishes"""
+        key = self.cache.fingerprint(len(self.nodes), self.edges)
+        filename = self.cache.trees_filename(key)
+        if self.cache.has_trees(key):
+            reader = SpanningTreesReader(filename)
+            if np.array_equal(reader.edges, np.array(self.edges).reshape(-1, 2)):
+                yield from reader
+                return
+            # same edge set stored in different order, translating edge IDs
+            edge_index = {}
+            for i, (u, v) in enumerate(self.edges):
+                edge_index[(u, v)] = edge_index[(v, u)] = i
+            translation = [edge_index[(int(u), int(v))] for u, v in reader.edges]
+            for edge_ids in reader:
+                yield tuple(sorted(translation[i] for i in edge_ids))
+            return
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        tmp_filename = "%s.%d.tmp" % (filename, os.getpid())
+        committed = False
+        try:
+            with SpanningTreesWriter(tmp_filename, len(self.nodes), self.edges) as writer:
+                trees = self.blocks if self.blocks.num_parts > 1 else TreeEnumerator(len(self.nodes), self.edges)
+                for edge_ids in trees:
+                    writer.write(edge_ids)
+                    yield edge_ids
+            self.cache.commit_trees(key, tmp_filename)
+            committed = True
+        finally:
+            if not committed and os.path.exists(tmp_filename):
+                os.remove(tmp_filename)
+
+    def export_spanning_trees(self, save_path="/test/run", workers=1, chunksize=64, export="adjacency_csv", trees=None, exist_ok=False,
+                              save_graph=None):
         """Exporting spanning trees to csv and images as in folder structure explained in compute_spanning_trees()
+        Given trees are exported, otherwise trees stored by compute_spanning_trees(), otherwise they are streamed
+        from iter_spanning_trees() in chunks, so that only a few chunks of trees are held in memory.
+        All trees are drawn with the layout of the whole graph (self.my_pos).
         
         Parameters
         ----------
         save_path : str, optional
             Path for saving, by default "/test/run"
+        workers : int, optional
+            Number of processes rendering images and writing csv files, by default 1 (no process pool)
+        chunksize : int, optional
+            Number of trees exported by one task, by default 64
+        export : str, optional
+            Export type, by default 'adjacency_csv'
+            Available options:
+                'adjacency_csv': csv file and png image per tree (structure below)
+                'edge_ids', 'bitmask': all trees in one binary file spanning_trees.bin, each tree stored as array
+                    of edge IDs or as bitmask over edges (see SpanningTreesFile), its header holds the edge list
+        trees : iterable of tuple, optional
+            Spanning trees as tuples of edge IDs, e.g. from sample_spanning_trees(), by default None (all spanning trees)
+        exist_ok : bool, optional
+            Reusing existing directory and overwriting files in it (e.g. of an interrupted export), by default False
+        save_graph : bool, optional
+            Saving the original graph: graph.png and graph_adjacency.csv for 'adjacency_csv' export,
+            graph.png and edge list graph_edges.csv for binary exports, by default None
+            (only for 'adjacency_csv' export of all trees, the layout and dense matrix are costly for large graphs)
         
         Output
         ------
@@ -113,55 +568,172 @@ class SpanningTrees:
         
         """
         
-        if len(self.spanning_trees) == 0:
-            raise ValueError("No spanning trees found. Please run compute_spanning_trees() first.")
+        if export not in ("adjacency_csv", "edge_ids", "bitmask"):
+            raise ValueError("Export %s not supported." % export)
+        if save_graph is None:
+            save_graph = export == "adjacency_csv" and trees is None
+        # iterators cannot be replayed by export_gif(), it enumerates the trees again instead
+        self.exported_trees = trees if isinstance(trees, (list, tuple)) else None
+        trees = self._tree_source(trees)
         
         if not os.path.exists(save_path):
             os.mkdir(save_path)
-            self.export_directory_path = save_path
-        else:
+        elif not exist_ok:
             raise OSError("Directory already exists. Creation of the directory %s failed" % save_path)
+        self.export_directory_path = save_path
     
-        self.graph_png_filename = os.path.join(save_path, "graph.png")
-        self.graph_csv_filename = os.path.join(save_path, "graph_adjacency.csv")
-        self.csv_output_directory = os.path.join(save_path, "csv_output")
-        self.image_output_directory = os.path.join(save_path, "images")
-        
-        
-        os.mkdir(self.csv_output_directory)
-        os.mkdir(self.image_output_directory)
+        if save_graph:
+            self.graph_png_filename = os.path.join(save_path, "graph.png")
+            # computing the layout first, so that it is timed by my_pos and not counted as drawing
+            self.my_pos
+            with self.profiler.timer("export_graph_figure"):
+                self.save_figure(filename=self.graph_png_filename)
+            with self.profiler.timer("export_graph_csv"):
+                if export == "adjacency_csv":
+                    self.graph_csv_filename = os.path.join(save_path, "graph_adjacency.csv")
+                    self.save_csv(filename=self.graph_csv_filename)
+                else:
+                    self.graph_csv_filename = os.path.join(save_path, "graph_edges.csv")
+                    self.graph_matrix.save(self.graph_csv_filename, mode="edges")
         
-        self.save_figure(filename=self.graph_png_filename)
-        self.save_csv(filename=self.graph_csv_filename)
+        if export != "adjacency_csv":
+            self.binary_filename = os.path.join(save_path, "spanning_trees.bin")
+            with self.profiler.timer("export"):
+                with SpanningTreesWriter(self.binary_filename, len(self.nodes), self.edges, encoding=export) as writer:
+                    exported = writer.write_many(trees)
+            self.profiler.count("exported_trees", exported)
+            if exported == 0:
+                raise ValueError("No spanning trees found. Graph is not connected.")
+            self.spanning_trees_exported = True
+            return
         
-        spanning_tree_objects = []
-        for graph in self.spanning_trees:
-            st = SpanningTrees(graph)
-            st.my_pos = self.my_pos
-            spanning_tree_objects.append(st)  
+        self.csv_output_directory = os.path.join(save_path, "csv_output")
+        self.image_output_directory = os.path.join(save_path, "images")
+        os.makedirs(self.csv_output_directory, exist_ok=exist_ok)
+        os.makedirs(self.image_output_directory, exist_ok=exist_ok)
         
-        for i, j in enumerate(spanning_tree_objects):
-            filename = os.path.join(self.image_output_directory, "spanning_tree_" + str(i).zfill(3) + ".png")
-            j.save_figure(filename=filename)
-            filename_csv = os.path.join(self.csv_output_directory, "spanning_tree_adjacency_" + str(i).zfill(3) + ".csv")
-            j.save_csv(filename=filename_csv)
+        context = {
+            "nodes": self.nodes,
+            "edges": self.edges,
+            "pos": self.my_pos,
+            "image_output_directory": self.image_output_directory,
+            "csv_output_directory": self.csv_output_directory,
+        }
+        chunks = iter(lambda: list(itertools.islice(trees, chunksize)), [])
+        exported = 0
+        with self.profiler.timer("export"):
+            if workers <= 1:
+                for chunk in chunks:
+                    self._add_export_times(_export_tree_chunk(exported, chunk, context))
+                    exported += len(chunk)
+            else:
+                with ProcessPoolExecutor(max_workers=workers, initializer=_init_export_worker, initargs=(context,)) as executor:
+                    pending = []
+                    for chunk in chunks:
+                        pending.append(executor.submit(_export_tree_chunk, exported, chunk))
+                        exported += len(chunk)
+                        # bounding number of chunks waiting in memory
+                        if len(pending) >= 2 * workers:
+                            self._add_export_times(pending.pop(0).result())
+                    for future in pending:
+                        self._add_export_times(future.result())
+        self.profiler.count("exported_trees", exported)
         
+        if exported == 0:
+            raise ValueError("No spanning trees found. Graph is not connected.")
         self.spanning_trees_exported = True
     
-    def export_gif(self):
-        """Exporting gif of spanning trees. Inspired by https://stackoverflow.com/a/35943809"""
+    def _add_export_times(self, result):
+        """Adding rendering and csv times of an exported chunk (see _export_tree_chunk()), summed over worker processes"""
+        _, render_seconds, csv_seconds = result
+        self.profiler.add_time("export_render", render_seconds)
+        self.profiler.add_time("export_csv", csv_seconds)
+
+    def _tree_source(self, trees=None):
+        """Iterator over given trees, otherwise over trees stored by compute_spanning_trees(), otherwise over all spanning trees"""
+        if trees is not None:
+            return iter(trees)
+        if len(self.spanning_trees) > 0:
+            return (self.tree_edge_ids(T) for T in self.spanning_trees)
+        return self.iter_spanning_trees()
+
+    def export_gif(self, step=1, max_frames=None, duration=0.2):
+        """Exporting gif of exported spanning trees into spanning_tree.gif of the export directory (see export_animation())"""
         if not self.spanning_trees_exported:
             raise ValueError("Spanning trees were not exported. Please run export_spanning_trees() first.")
+        self.export_animation(os.path.join(self.export_directory_path, "spanning_tree.gif"), trees=self.exported_trees,
+                              step=step, max_frames=max_frames, duration=duration)
 
-        images = []
-        #images.append(self.graph_png_filename)
-        for filename in sorted(os.listdir(self.image_output_directory)):
-            images.append(imageio.imread(os.path.join(self.image_output_directory, filename)))
-        imageio.mimsave(os.path.join(self.export_directory_path, "spanning_tree.gif"), images, duration=0.2)
+    def export_animation(self, filename, trees=None, step=1, max_frames=None, duration=0.2):
+        """Exporting animation of spanning trees, one frame per tree. Inspired by https://stackoverflow.com/a/35943809
+        Nodes and labels are drawn once into a reusable figure, every frame only replaces segments of the edge collection
+        and redraws it over the cached background. Frames are rendered into memory and streamed into the encoder one at a time,
+        so no png files are written and memory does not grow with the number of frames.
+        
+        Parameters
+        ----------
+        filename : str
+            Output file, format is given by extension ('.gif' is streamed by GifWriter, other formats such as '.mp4'
+            are written by imageio and may need its plugins, e.g. imageio-ffmpeg)
+        trees : iterable of tuple, optional
+            Spanning trees as tuples of edge IDs, by default trees stored by compute_spanning_trees() or all spanning trees
+        step : int, optional
+            Using every step-th tree only, by default 1
+        max_frames : int, optional
+            Maximal number of frames, by default None (no limit)
+        duration : float, optional
+            Duration of one frame in seconds, by default 0.2
+        """
+        import imageio
+        import matplotlib.pyplot as plt
+        from matplotlib.collections import LineCollection
+        from spanning_trees_search.GifWriter import GifWriter
+        trees = itertools.islice(self._tree_source(trees), 0, None, step)
+        if max_frames is not None:
+            trees = itertools.islice(trees, max_frames)
+        pos = self.my_pos
+        points = np.array([pos[node] for node in self.nodes])
+        segments = points[np.array(self.edges, dtype=np.int64).reshape(-1, 2)]
 
-    
-    def compute_spanning_trees(self, visualisation=True, export='adjacency_csv', save_path="/test/run", progress_bar=False):
-        """Recursively searching and visualising spanning trees
+        # same look as nx.draw(T, with_labels=True, node_color='pink', pos=self.my_pos) of the exported images
+        fig = plt.figure()
+        ax = fig.add_subplot()
+        ax.set_axis_off()
+        lines = LineCollection([], colors="k", linewidths=1.0, zorder=1)
+        ax.add_collection(lines)
+        nodes = nx.draw_networkx_nodes(self.nx_graph, pos=pos, node_color='pink', ax=ax)
+        labels = list(nx.draw_networkx_labels(self.nx_graph, pos=pos, ax=ax).values())
+        ax.autoscale_view()
+        fig.canvas.draw()
+        background = fig.canvas.copy_from_bbox(fig.bbox)
+
+        if filename.endswith(".gif"):
+            writer = GifWriter(filename, duration=duration)
+        else:
+            writer = imageio.get_writer(filename, fps=1 / duration)
+        frames = 0
+        start = time.perf_counter()
+        try:
+            for edge_ids in trees:
+                fig.canvas.restore_region(background)
+                lines.set_segments(segments[list(edge_ids)])
+                ax.draw_artist(lines)
+                ax.draw_artist(nodes)
+                for label in labels:
+                    ax.draw_artist(label)
+                writer.append_data(np.asarray(fig.canvas.buffer_rgba())[:, :, :3])
+                frames += 1
+        finally:
+            writer.close()
+            plt.close(fig)
+        self.profiler.add_time("animation", time.perf_counter() - start)
+        self.profiler.count("animation_frames", frames)
+        if frames == 0:
+            raise ValueError("No spanning trees to animate.")
+
+    def compute_spanning_trees(self, visualisation=True, export='adjacency_csv', save_path="/test/run", progress_bar=False, algorithm="contraction_deletion", workers=1,
+                               required_edges=None, forbidden_edges=None):
+        """Searching and visualising spanning trees
         Spanning tree is induced subgraph of the given graph, that is connected and has no cycles, therefore it is a tree.
         
             visualisation : str, optional
@@ -170,6 +742,16 @@ class SpanningTrees:
         export : str, optional
             Export type, by default 'none'
             Available options: 'adjacency_csv', 'incidence_csv', 'degree_csv', None
+        algorithm : str, optional
+            Search algorithm, by default 'contraction_deletion'
+            Available options:
+                'contraction_deletion': deterministic enumeration of every spanning tree exactly once (see TreeEnumerator)
+                'random': original randomized recursive search (in random order, slower)
+        workers : int, optional
+            Number of processes of 'contraction_deletion' search (see iter_spanning_trees()), by default 1
+        required_edges, forbidden_edges : iterable of (node, node), optional
+            Searching only spanning trees containing all required edges and none of forbidden edges, by default None
+            (see iter_spanning_trees(), 'contraction_deletion' only). Their number is counted in advance by spanning_trees_count().
         
         Description
         -----------
@@ -182,63 +764,114 @@ class SpanningTrees:
             Then we are fixing the edge (creating left children) and removing it from the graph (creating right children)
             In next iteration we repeat the same procedure for left and right children, until we reach the leaves of the tree.
             (We are using recursion and passing fixed edges and number of iteration)
+        With 'contraction_deletion' edges are chosen systematically in the order of their IDs, so no choice is ever retried.
         """       
-                
+        import matplotlib.pyplot as plt
+        from tqdm import tqdm
+        included, excluded = self._constraint_edge_ids(required_edges, forbidden_edges)
+        constrained = bool(included or excluded)
+        if algorithm == "random":
+            if constrained:
+                raise ValueError("Required and forbidden edges are supported by 'contraction_deletion' algorithm only.")
+            self._compute_spanning_trees_random(visualisation=visualisation, progress_bar=progress_bar)
+            return
+        elif algorithm != "contraction_deletion":
+            raise ValueError("Algorithm %s not supported." % algorithm)
+
+        if constrained:
+            count = self.spanning_trees_count(required_edges=required_edges, forbidden_edges=forbidden_edges)
+        else:
+            if self.spanning_trees_num == 0:
+                self.spanning_trees_count()
+            count = self.spanning_trees_num
+        print("Number of spanning trees is: ", count)
+        bar = tqdm(total=count, disable=not progress_bar)
+        for edge_ids in self.iter_spanning_trees(workers=workers, required_edges=required_edges, forbidden_edges=forbidden_edges):
+            T = self.tree_graph(edge_ids)
+            self.spanning_trees.append(T)
+            if visualisation:
+                plt.figure(figsize=(2, 2))
+                nx.draw(T, pos = self.my_pos, with_labels=True, node_color='pink', node_size=100)
+            bar.update(1)
+        bar.close()
+        if visualisation:
+            plt.show()
+
+    def _compute_spanning_trees_random(self, visualisation=True, progress_bar=False):
+        """Randomized recursive search of spanning trees, see compute_spanning_trees()"""
+        import matplotlib.pyplot as plt
+        from tqdm import tqdm
         G = self.nx_graph
         if self.spanning_trees_num == 0:
             number_of_trees = self.spanning_trees_count()
         print("Number of spanning trees is: ", self.spanning_trees_num)
-        bar = tqdm(total=self.spanning_trees_num)
+        bar = tqdm(total=self.spanning_trees_num, disable=not progress_bar)
+        
+        node_index = {node: i for i, node in enumerate(self.nodes)}
+        result_trees = set()
         
         # Inner recursive function
-        def fnc(G, fixed_edges=[], result_trees = [], iter_count = 0, itermax = self.spanning_trees_num):
+        profiler = self.profiler
+        def fnc(G, fixed_edges=(), iter_count = 0, itermax = self.spanning_trees_num):
             # Limiting iterations to not exhaust memory
             if iter_count >= itermax:
+                profiler.count("search_limit_exits")
                 return
+            profiler.count("search_nodes")
             # Every node is a copy of previous graph
             G = G.copy()
+            # Edges closing a cycle of fixed edges are in no spanning tree of this branch, they are deleted outright
+            # (graph stays connected through the fixed edges), as in TreeEnumerator
+            uf = UnionFind(len(self.nodes))
+            for u, v in fixed_edges:
+                uf.union(node_index[u], node_index[v])
+            fixed = set(frozenset(e) for e in fixed_edges)
+            G.remove_edges_from([e for e in G.edges() if frozenset(e) not in fixed and uf.find(node_index[e[0]]) == uf.find(node_index[e[1]])])
             edges = list(G.edges())
-            # If graph is connected and tree, we have found a spanning tree and can draw it
-            if nx.is_connected(G) and self.is_tree(G):
-                if not set(G.edges) in result_trees:
-                    result_trees.append(set(G.edges))
+            # Graph stays connected (only non-bridge edges are removed), if it is a tree we have found a spanning tree and can draw it
+            if self.is_tree(G):
+                tree_key = frozenset(frozenset(e) for e in edges)
+                if tree_key in result_trees:
+                    profiler.count("search_duplicates")
+                else:
+                    profiler.count("trees")
+                    result_trees.add(tree_key)
                     self.spanning_trees.append(G)
                     if visualisation:
                         plt.figure(figsize=(2, 2))
                         nx.draw(G, pos = self.my_pos, with_labels=True, node_color='pink', node_size=100)
                     if progress_bar:
                         bar.update(1)
-                        #print("Spanning trees found: ", iter_count, "/", itermax)
-                        #print(".", end="")
             
             # Edges to choose are all remaining edges - fixed_edges
             # If there is nothing left to choose, we exhausted all possible edges, return
-            edges_to_choose = list(set(edges) - set(fixed_edges))
+            edges_to_choose = [e for e in edges if frozenset(e) not in fixed]
             if len(edges_to_choose) == 0:
                 return
             
-            # Choosing edge for removal and fixation
-            choice_is_ok = False
-            tries = 0 
-            
-            while not choice_is_ok:
-                e = random.choice(list(edges_to_choose)) #FIXME systematic choice might be more efficient
-                H = G.copy()
-                H.remove_edge(e[0], e[1])
-                # Checking if removal of chosen edge doesnt disconnect the graph and its fixation doesnt create cycle
-                choice_is_ok = (not self.check_cycle(fixed_edges + [e])[0]) and nx.is_connected(H) and (not G.copy() in self.spanning_trees)
-                tries += 1
-                # If we have tried too many times and cannot found good edge, we are giving up
-                if tries > G.number_of_edges():
-                    return
+            # Choosing edge for removal and fixation:
+            # its removal should not disconnect the graph (it is not a bridge, all bridges found at once by Tarjan's algorithm),
+            # its fixation cannot create cycle of fixed edges (such edges were deleted above)
+            bridges = set()
+            for u, v in nx.bridges(G):
+                bridges.add((u, v))
+                bridges.add((v, u))
+            candidates = [e for e in edges_to_choose if e not in bridges]
+            # If there is no good edge, all remaining edges are bridges and the graph was a tree
+            if len(candidates) == 0:
+                return
+            e = random.choice(candidates)
             
-            # If we found good possible edge
-            if choice_is_ok:
-                # Fixing the edge in left branch
-                fnc(G, fixed_edges + [e], iter_count=iter_count + 1)
-                # Removig the edge in right branch
-                G.remove_edge(e[0], e[1])
-                fnc(G, iter_count=iter_count + 1)
-        fnc(G)
+            # Fixing the edge in left branch
+            fnc(G, tuple(fixed_edges) + (e,), iter_count=iter_count + 1)
+            # Removig the edge in right branch, fixed edges stay fixed
+            G.remove_edge(e[0], e[1])
+            fnc(G, fixed_edges, iter_count=iter_count + 1)
+        if not nx.is_connected(G):
+            bar.close()
+            return
+        with profiler.timer("search"):
+            fnc(G)
+        bar.close()
         if visualisation:
             plt.show()
\ No newline at end of file
@@ -0,0 +1,183 @@
+import os
+import struct
+import numpy as np
+
+
+# Header: magic, format version, encoding, byte size of one edge ID, number of nodes, number of edges, size of one tree record
+_HEADER = struct.Struct("<6sBBB7xQQQ")
+_MAGIC = b"STREES"
+_VERSION = 1
+_ENCODINGS = {"edge_ids": 0, "bitmask": 1}
+
+
+def _id_dtype(num_edges):
+    """Smallest unsigned integer type able to store edge IDs 0..num_edges-1"""
+    for dtype in (np.uint8, np.uint16, np.uint32):
+        if num_edges <= np.iinfo(dtype).max + 1:
+            return np.dtype(dtype)
+    return np.dtype(np.uint64)
+
+
+def _record_size(num_nodes, num_edges, encoding):
+    """Size of one tree record in bytes, at least 1 byte, so that the empty tree of a graph with one node
+    (or without edges) still occupies space and number of trees follows from the file size"""
+    if encoding == "bitmask":
+        size = (num_edges + 7) // 8
+    else:
+        size = max(num_nodes - 1, 0) * _id_dtype(num_edges).itemsize
+    return max(size, 1)
+
+
+class SpanningTreesWriter:
+    """Streaming writer of spanning trees into one compact binary file.
+
+    File starts with a header and the edge list of the parent graph (int64 pairs),
+    followed by fixed size records, one per tree:
+        - 'edge_ids': n-1 sorted edge IDs stored in the smallest sufficient unsigned integer type
+        - 'bitmask': m bits packed into ceil(m/8) bytes, bit i set if edge i is in the tree
+    Number of trees is not stored, it follows from the file size, so the file can be appended to.
+    Empty records (trees of a graph with one node) are padded to one zero byte.
+
+    Parameters
+    ----------
+    filename : str
+    num_nodes : int
+    edges : list of (int, int)
+        Edge list of the parent graph, tree records refer to its indices
+    encoding : str, optional
+        'edge_ids' or 'bitmask', by default 'edge_ids'
+    append : bool, optional
+        Appending to an existing file of the same graph and encoding instead of creating new one, by default False
+    buffer_size : int, optional
+        Number of trees buffered before writing to disk, by default 4096
+    """
+
+    def __init__(self, filename, num_nodes, edges, encoding="edge_ids", append=False, buffer_size=4096):
+        if encoding not in _ENCODINGS:
+            raise ValueError("Encoding %s not supported." % encoding)
+        self.filename = filename
+        self.num_nodes = num_nodes
+        self.edges = np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+        self.encoding = encoding
+        self.id_dtype = _id_dtype(len(self.edges))
+        self.record_size = _record_size(num_nodes, len(self.edges), encoding)
+        self.buffer_size = buffer_size
+        self.buffer = []
+        self.trees_written = 0
+
+        if append and os.path.exists(filename):
+            reader = SpanningTreesReader(filename)
+            if (reader.num_nodes != num_nodes or reader.encoding != encoding
+                    or not np.array_equal(reader.edges, self.edges)):
+                raise ValueError("File %s stores trees of a different graph or encoding. Cannot append." % filename)
+            self.trees_written = len(reader)
+            del reader
+            self.file = open(filename, "ab")
+        else:
+            self.file = open(filename, "wb")
+            self.file.write(_HEADER.pack(_MAGIC, _VERSION, _ENCODINGS[encoding], self.id_dtype.itemsize,
+                                         num_nodes, len(self.edges), self.record_size))
+            self.file.write(self.edges.tobytes())
+
+    def write(self, edge_ids):
+        """Writing one spanning tree given by tuple of edge IDs"""
+        if len(edge_ids) != max(self.num_nodes - 1, 0):
+            raise ValueError("Spanning tree must have %d edges." % max(self.num_nodes - 1, 0))
+        self.buffer.append(edge_ids)
+        if len(self.buffer) >= self.buffer_size:
+            self.flush()
+
+    def write_many(self, trees):
+        """Writing all spanning trees of an iterable, returns number of written trees"""
+        count = 0
+        for edge_ids in trees:
+            self.write(edge_ids)
+            count += 1
+        return count
+
+    def flush(self):
+        """Writing buffered trees to disk"""
+        if not self.buffer:
+            return
+        ids = np.array(self.buffer, dtype=np.int64).reshape(len(self.buffer), -1)
+        if self.encoding == "bitmask":
+            bits = np.zeros((len(self.buffer), len(self.edges)), dtype=np.uint8)
+            np.put_along_axis(bits, ids, 1, axis=1)
+            records = np.packbits(bits, axis=1, bitorder="little")
+        else:
+            records = np.sort(ids, axis=1).astype(self.id_dtype.newbyteorder("<"))
+        data = records.tobytes()
+        if len(data) < self.record_size * len(self.buffer):
+            # padding of empty records
+            data = bytes(self.record_size * len(self.buffer))
+        self.file.write(data)
+        self.trees_written += len(self.buffer)
+        self.buffer = []
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class SpanningTreesReader:
+    """Random access reader of files written by SpanningTreesWriter.
+    Records are memory-mapped, so reading tree k does not parse the rest of the file.
+
+    Parameters
+    ----------
+    filename : str
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        with open(filename, "rb") as f:
+            header = f.read(_HEADER.size)
+        if len(header) < _HEADER.size:
+            raise ValueError("File %s is not a spanning trees file." % filename)
+        magic, version, encoding, itemsize, num_nodes, num_edges, record_size = _HEADER.unpack(header)
+        if magic != _MAGIC or version != _VERSION:
+            raise ValueError("File %s is not a spanning trees file." % filename)
+        self.encoding = {code: name for name, code in _ENCODINGS.items()}[encoding]
+        self.num_nodes = num_nodes
+        self.record_size = record_size
+        self.edges = np.fromfile(filename, dtype="<i8", count=2 * num_edges, offset=_HEADER.size).reshape(-1, 2)
+        self.data_offset = _HEADER.size + 16 * num_edges
+
+        data_size = os.path.getsize(filename) - self.data_offset
+        self.num_trees = data_size // record_size if record_size else 0
+        if self.encoding == "bitmask":
+            dtype, width = np.dtype(np.uint8), record_size
+        else:
+            dtype, width = _id_dtype(num_edges).newbyteorder("<"), max(num_nodes - 1, 0)
+        if width == 0:
+            # padding bytes of empty trees are not read
+            self.records = np.zeros((self.num_trees, 0), dtype=dtype)
+        elif self.num_trees > 0:
+            self.records = np.memmap(filename, dtype=dtype, mode="r", offset=self.data_offset, shape=(self.num_trees, width))
+        else:
+            self.records = np.zeros((0, width), dtype=dtype)
+
+    def __len__(self):
+        return self.num_trees
+
+    def __getitem__(self, k):
+        """Spanning tree number k as sorted tuple of edge IDs"""
+        if k < 0:
+            k += self.num_trees
+        if not 0 <= k < self.num_trees:
+            raise IndexError("Spanning tree index out of range.")
+        record = self.records[k]
+        if self.encoding == "bitmask":
+            bits = np.unpackbits(record, bitorder="little")[:len(self.edges)]
+            return tuple(int(i) for i in np.flatnonzero(bits))
+        return tuple(int(i) for i in record)
+
+    def __iter__(self):
+        for k in range(self.num_trees):
+            yield self[k]
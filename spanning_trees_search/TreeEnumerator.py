@@ -0,0 +1,186 @@
+class UnionFind:
+    """Union-find (disjoint set) over integer vertices 0..n-1 with rollback of the last unions.
+    Union by size without path compression, so that every union can be undone in O(1).
+    """
+
+    def __init__(self, n):
+        self.parent = list(range(n))
+        self.size = [1] * n
+        self.history = []
+
+    def find(self, x):
+        """Finding representative of the set containing x"""
+        parent = self.parent
+        while parent[x] != x:
+            x = parent[x]
+        return x
+
+    def union(self, x, y):
+        """Joining sets of x and y, returns False if they were already joined"""
+        x = self.find(x)
+        y = self.find(y)
+        if x == y:
+            self.history.append(None)
+            return False
+        if self.size[x] < self.size[y]:
+            x, y = y, x
+        self.parent[y] = x
+        self.size[x] += self.size[y]
+        self.history.append(y)
+        return True
+
+    def rollback(self):
+        """Undoing the last union"""
+        y = self.history.pop()
+        if y is None:
+            return
+        x = self.parent[y]
+        self.parent[y] = y
+        self.size[x] -= self.size[y]
+
+
+class TreeEnumerator:
+    """Deterministic enumeration of all spanning trees of a graph given by integer edge IDs.
+
+    Parameters
+    ----------
+    num_nodes : int
+        Vertices are 0..num_nodes-1
+    edges : list of (int, int)
+        Edge with ID i is edges[i]
+    included : iterable of int, optional
+        IDs of edges contained in every enumerated tree, by default none
+    excluded : iterable of int, optional
+        IDs of edges avoided by every enumerated tree, by default none
+    profiler : Profiler, optional
+        Receiving counters search_nodes and search_pruned_branches (branches cut because they hold no tree)
+        whenever a tree is emitted, by default None
+
+    Description
+    -----------
+    Contraction/deletion binary partition of the set of spanning trees. Edges are decided in the order of their IDs:
+        - left branch includes (contracts) the edge, it is skipped when the edge closes a cycle of included edges
+        - right branch deletes the edge, it is skipped when the edge is a bridge of the remaining graph
+    Both checks keep the invariant that included edges are acyclic and the remaining graph is connected,
+    so every node of the search has at least one spanning tree below it and every leaf is a distinct spanning tree.
+    Each tree is therefore emitted exactly once with O(m * (n + m)) delay, and the search uses O(n + m) memory.
+    Included and excluded edges are decided up front (contracted and deleted), the search skips them,
+    so a node of the search tree of the whole graph can be enumerated on its own (see SpanningTrees.iter_spanning_trees()).
+    """
+
+    def __init__(self, num_nodes, edges, included=(), excluded=(), profiler=None):
+        self.num_nodes = num_nodes
+        self.profiler = profiler
+        self.edges = [(int(u), int(v)) for u, v in edges]
+        self.included = sorted(set(int(i) for i in included))
+        self.excluded = sorted(set(int(i) for i in excluded))
+        self.adjacency = [[] for _ in range(num_nodes)]
+        for i, (u, v) in enumerate(self.edges):
+            if u != v:
+                self.adjacency[u].append((v, i))
+                self.adjacency[v].append((u, i))
+
+    def _reachable(self, source, target, deleted):
+        """Checking if target is reachable from source without using deleted edges"""
+        if source == target:
+            return True
+        seen = [False] * self.num_nodes
+        seen[source] = True
+        stack = [source]
+        while stack:
+            x = stack.pop()
+            for y, i in self.adjacency[x]:
+                if deleted[i] or seen[y]:
+                    continue
+                if y == target:
+                    return True
+                seen[y] = True
+                stack.append(y)
+        return False
+
+    def is_connected(self, deleted=None):
+        """Checking if graph without deleted edges is connected"""
+        n = self.num_nodes
+        if n == 0:
+            return False
+        if deleted is None:
+            deleted = [False] * len(self.edges)
+        seen = [False] * n
+        seen[0] = True
+        stack = [0]
+        visited = 1
+        while stack:
+            x = stack.pop()
+            for y, i in self.adjacency[x]:
+                if not deleted[i] and not seen[y]:
+                    seen[y] = True
+                    visited += 1
+                    stack.append(y)
+        return visited == n
+
+    def __iter__(self):
+        """Yielding spanning trees as sorted tuples of edge IDs"""
+        n = self.num_nodes
+        edges = self.edges
+        deleted = [False] * len(edges)
+        fixed = [False] * len(edges)
+        for i in self.excluded:
+            deleted[i] = fixed[i] = True
+        if not self.is_connected(deleted):
+            return
+        uf = UnionFind(n)
+        included = []
+        for i in self.included:
+            if deleted[i] or not uf.union(*edges[i]):
+                # included edges contain a cycle or an excluded edge, there is no such tree
+                return
+            fixed[i] = True
+            included.append(i)
+        presorted = not self.included
+        profiler = self.profiler
+        # plain local counters, handed over to profiler only when a tree is emitted
+        visited = pruned = 0
+
+        # Explicit stack instead of recursion, depth of the search is up to number of edges
+        # Frame states: 0 - entering edge i, 1 - returning from include branch, 2 - returning from delete branch
+        stack = [(0, 0)]
+        while stack:
+            i, state = stack.pop()
+            if state == 0:
+                visited += 1
+                if len(included) == n - 1:
+                    if profiler is not None:
+                        profiler.count("search_nodes", visited)
+                        profiler.count("search_pruned_branches", pruned)
+                        visited = pruned = 0
+                    yield tuple(included) if presorted else tuple(sorted(included))
+                    continue
+                if fixed[i]:
+                    stack.append((i + 1, 0))
+                    continue
+                u, v = edges[i]
+                if uf.find(u) == uf.find(v):
+                    # Edge closes a cycle, it can only be deleted (graph stays connected through included edges)
+                    pruned += 1
+                    deleted[i] = True
+                    stack.append((i, 2))
+                    stack.append((i + 1, 0))
+                else:
+                    uf.union(u, v)
+                    included.append(i)
+                    stack.append((i, 1))
+                    stack.append((i + 1, 0))
+            elif state == 1:
+                included.pop()
+                uf.rollback()
+                u, v = edges[i]
+                deleted[i] = True
+                # Deleting is possible only if the edge is not a bridge of the remaining graph
+                if self._reachable(u, v, deleted):
+                    stack.append((i, 2))
+                    stack.append((i + 1, 0))
+                else:
+                    pruned += 1
+                    deleted[i] = False
+            else:
+                deleted[i] = False
@@ -0,0 +1,86 @@
+import heapq
+import itertools
+from spanning_trees_search.TreeEnumerator import UnionFind
+
+
+class TreeRanker:
+    """Ranking spanning trees of a weighted graph given by integer edge IDs in order of increasing total weight.
+
+    Parameters
+    ----------
+    num_nodes : int
+        Vertices are 0..num_nodes-1
+    edges : list of (int, int)
+        Edge with ID i is edges[i]
+    weights : list of float
+        Weight of edge with ID i is weights[i]
+
+    Description
+    -----------
+    Lawler's partition scheme over Kruskal's algorithm:
+        - every subproblem is the set of spanning trees containing edges IN and avoiding edges OUT,
+          its best tree is found by Kruskal's algorithm with IN edges joined first and OUT edges skipped
+        - subproblems are kept in a heap ordered by weight of their best tree
+        - when the best tree T = IN + {e_1, ..., e_r} of a subproblem is taken, the rest of the subproblem
+          is partitioned into subproblems (IN + e_1..e_j-1, OUT + e_j) for j = 1..r
+    Subproblems are disjoint and cover all trees, so trees come out in ranked order, each exactly once.
+    Edges are sorted by weight once, taking the next tree costs at most n-1 runs of Kruskal's algorithm,
+    so the k best trees take O(k n m log n) time regardless of the total number of spanning trees.
+    """
+
+    def __init__(self, num_nodes, edges, weights):
+        self.num_nodes = num_nodes
+        self.edges = [(int(u), int(v)) for u, v in edges]
+        self.weights = [float(w) for w in weights]
+        if len(self.weights) != len(self.edges):
+            raise ValueError("Number of weights does not match number of edges.")
+        self.order = sorted(range(len(self.edges)), key=lambda i: self.weights[i])
+
+    def minimum_spanning_tree(self, included=(), excluded=()):
+        """Kruskal's algorithm restricted to trees containing included edges and avoiding excluded edges.
+        Returns (weight, sorted tuple of edge IDs), or None if there is no such tree."""
+        n = self.num_nodes
+        if n == 0:
+            return None
+        uf = UnionFind(n)
+        tree = []
+        for i in included:
+            if not uf.union(*self.edges[i]):
+                return None
+            tree.append(i)
+        skipped = set(excluded)
+        skipped.update(included)
+        for i in self.order:
+            if len(tree) == n - 1:
+                break
+            if i in skipped:
+                continue
+            if uf.union(*self.edges[i]):
+                tree.append(i)
+        if len(tree) != n - 1:
+            return None
+        tree.sort()
+        return sum(self.weights[i] for i in tree), tuple(tree)
+
+    def __iter__(self):
+        """Yielding (weight, sorted tuple of edge IDs) of all spanning trees in order of increasing weight"""
+        counter = itertools.count()
+        best = self.minimum_spanning_tree()
+        if best is None:
+            return
+        heap = [(best[0], next(counter), best[1], (), ())]
+        while heap:
+            weight, _, tree, included, excluded = heapq.heappop(heap)
+            yield weight, tree
+            fixed = set(included)
+            free = [i for i in tree if i not in fixed]
+            for j, edge in enumerate(free):
+                sub_included = included + tuple(free[:j])
+                sub_excluded = excluded + (edge,)
+                best = self.minimum_spanning_tree(sub_included, sub_excluded)
+                if best is not None:
+                    heapq.heappush(heap, (best[0], next(counter), best[1], sub_included, sub_excluded))
+
+    def k_best(self, k):
+        """List of k lowest weight spanning trees as (weight, sorted tuple of edge IDs), in ranked order"""
+        return list(itertools.islice(self, k))
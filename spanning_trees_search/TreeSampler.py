@@ -0,0 +1,97 @@
+import numpy as np
+from scipy import sparse
+from scipy.sparse.csgraph import connected_components
+
+
+class TreeSampler:
+    """Uniform random sampling of spanning trees of a graph given by integer edge IDs.
+
+    Parameters
+    ----------
+    num_nodes : int
+        Vertices are 0..num_nodes-1
+    edges : list of (int, int)
+        Edge with ID i is edges[i]
+    seed : int, optional
+        Random seed, by default None
+
+    Description
+    -----------
+    Wilson's algorithm: starting from a random root, a random walk is run from every vertex not yet in the tree
+    until it hits the tree, and its loop-erased path is added to the tree. Loop erasure is implicit, only the last
+    exit edge of every visited vertex is remembered. Every spanning tree is drawn with exactly the same probability,
+    expected running time per tree is the mean hitting time of the graph (near-linear for most graphs)
+    and memory is O(n + m).
+    Neighbours are stored in CSR arrays and random numbers are drawn from NumPy in batches,
+    so that the walk itself is a plain loop over Python lists.
+    """
+
+    def __init__(self, num_nodes, edges, seed=None):
+        self.num_nodes = num_nodes
+        E = np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+        ids = np.arange(len(E), dtype=np.int64)
+        # self-loops are never part of a spanning tree
+        keep = E[:, 0] != E[:, 1]
+        E, ids = E[keep], ids[keep]
+        sources = np.concatenate([E[:, 0], E[:, 1]])
+        targets = np.concatenate([E[:, 1], E[:, 0]])
+        order = np.argsort(sources, kind="stable")
+        self.offsets = np.zeros(num_nodes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=num_nodes), out=self.offsets[1:])
+        self.neighbours = targets[order]
+        self.edge_ids = np.concatenate([ids, ids])[order]
+        self.rng = np.random.default_rng(seed)
+
+    def is_connected(self):
+        """Checking if graph is connected"""
+        if self.num_nodes == 0:
+            return False
+        A = sparse.csr_matrix((np.ones(len(self.neighbours)), self.neighbours, self.offsets), shape=(self.num_nodes, self.num_nodes))
+        return connected_components(A, directed=False, return_labels=False) == 1
+
+    def sample(self, k, batch_size=1 << 16):
+        """Yielding k uniformly random spanning trees as sorted tuples of edge IDs
+
+        Parameters
+        ----------
+        k : int
+            Number of sampled trees
+        batch_size : int, optional
+            Number of random numbers drawn from NumPy at once, by default 65536
+        """
+        n = self.num_nodes
+        if not self.is_connected():
+            raise ValueError("No spanning trees found. Graph is not connected.")
+        offsets = self.offsets.tolist()
+        neighbours = self.neighbours.tolist()
+        edge_ids = self.edge_ids.tolist()
+        rng = self.rng
+        randoms = []
+        r = 0
+        for _ in range(k):
+            in_tree = [False] * n
+            next_node = [0] * n
+            next_edge = [0] * n
+            in_tree[int(rng.integers(n))] = True
+            tree = []
+            for start in range(n):
+                # random walk until the tree is hit, remembering the last exit of every vertex
+                u = start
+                while not in_tree[u]:
+                    if r == len(randoms):
+                        randoms = rng.random(batch_size).tolist()
+                        r = 0
+                    begin = offsets[u]
+                    j = begin + int(randoms[r] * (offsets[u + 1] - begin))
+                    r += 1
+                    next_node[u] = neighbours[j]
+                    next_edge[u] = edge_ids[j]
+                    u = neighbours[j]
+                # adding the loop-erased path
+                u = start
+                while not in_tree[u]:
+                    in_tree[u] = True
+                    tree.append(next_edge[u])
+                    u = next_node[u]
+            tree.sort()
+            yield tuple(tree)